@@ -23,7 +23,8 @@ for module in (
     "src.models.user",
     "src.models.session",
     "src.models.urban_quality",
-    "src.models.unequality_indicators"
+    "src.models.unequality_indicators",
+    "src.models.dataset_version"
 ):
     importlib.import_module(module)
 
@@ -0,0 +1,33 @@
+"""add urban_quality point index
+
+Revision ID: 3f9a1c7e2b54
+Revises: 11628c9d4786
+Create Date: 2025-10-12 18:04:11.214530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7e2b54'
+down_revision: Union[str, Sequence[str], None] = '11628c9d4786'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Índice GiST sobre la expresión point(lon, lat) (tipo geométrico nativo de
+    # Postgres, no requiere PostGIS). Lo usan los filtros `<@ box(...)` de
+    # src/services/service.py para las consultas por bounding box.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_urban_quality_point "
+        "ON urban_quality USING gist (point(lon, lat))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_urban_quality_point")
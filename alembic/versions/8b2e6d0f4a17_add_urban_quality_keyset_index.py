@@ -0,0 +1,33 @@
+"""add urban_quality keyset index
+
+Revision ID: 8b2e6d0f4a17
+Revises: 3f9a1c7e2b54
+Create Date: 2025-10-13 11:26:48.903117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e6d0f4a17'
+down_revision: Union[str, Sequence[str], None] = '3f9a1c7e2b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Orden estable (lat, lon, id) para la paginación keyset de /api/v1.
+    op.create_index(
+        'ix_urban_quality_lat_lon_id',
+        'urban_quality',
+        ['lat', 'lon', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_urban_quality_lat_lon_id', table_name='urban_quality')
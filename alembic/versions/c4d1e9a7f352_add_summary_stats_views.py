@@ -0,0 +1,93 @@
+"""add summary stats materialized views
+
+Revision ID: c4d1e9a7f352
+Revises: 8b2e6d0f4a17
+Create Date: 2025-10-14 09:12:31.284511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d1e9a7f352'
+down_revision: Union[str, Sequence[str], None] = '8b2e6d0f4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# urban_quality no trae municipio: se resume por regiones de 0.05° (~5 km)
+# y en total. Cada fila tiene (level, key) único para REFRESH CONCURRENTLY.
+URBAN_QUALITY_STATS = """
+CREATE MATERIALIZED VIEW mv_urban_quality_stats AS
+SELECT
+    CASE WHEN GROUPING(cell_lat, cell_lon) = 0 THEN 'region' ELSE 'total' END AS level,
+    CASE WHEN GROUPING(cell_lat, cell_lon) = 0
+        THEN ((cell_lat + 0.5) * 0.05)::numeric(9, 3) || ',' || ((cell_lon + 0.5) * 0.05)::numeric(9, 3)
+        ELSE ''
+    END AS key,
+    ((cell_lat + 0.5) * 0.05)::numeric(9, 3)::float8 AS lat,
+    ((cell_lon + 0.5) * 0.05)::numeric(9, 3)::float8 AS lon,
+    count(*) AS points,
+    sum("POBTOT") AS pobtot_sum,
+    avg("GRAPROES")::float8 AS graproes_mean,
+    avg("GRAPROES_F")::float8 AS graproes_f_mean,
+    avg("GRAPROES_M")::float8 AS graproes_m_mean,
+    sum("ARBOLES_C") AS arboles_sum,
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY "ARBOLES_C") AS arboles_p25,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY "ARBOLES_C") AS arboles_p50,
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY "ARBOLES_C") AS arboles_p75,
+    percentile_cont(0.9) WITHIN GROUP (ORDER BY "ARBOLES_C") AS arboles_p90
+FROM (
+    SELECT floor(lat / 0.05) AS cell_lat, floor(lon / 0.05) AS cell_lon, "POBTOT",
+           "GRAPROES", "GRAPROES_F", "GRAPROES_M", "ARBOLES_C"
+    FROM urban_quality
+) AS points
+GROUP BY GROUPING SETS ((cell_lat, cell_lon), ())
+"""
+
+# Por municipio (clave INEGI ent+mun), por sistema urbano nacional (SUN) y total
+UNEQUALITY_STATS = """
+CREATE MATERIALIZED VIEW mv_unequality_stats AS
+SELECT
+    CASE
+        WHEN GROUPING(cve_ent, cve_mun) = 0 THEN 'municipality'
+        WHEN GROUPING(cve_sun) = 0 THEN 'sun'
+        ELSE 'total'
+    END AS level,
+    CASE
+        WHEN GROUPING(cve_ent, cve_mun) = 0 THEN lpad(cve_ent::text, 2, '0') || lpad(cve_mun::text, 3, '0')
+        WHEN GROUPING(cve_sun) = 0 THEN cve_sun
+        ELSE ''
+    END AS key,
+    min(sun) AS sun,
+    count(*) AS zones,
+    sum("Pob_2010") AS pobtot_sum,
+    avg("Empleo")::float8 AS empleo_mean,
+    avg("E_basica")::float8 AS e_basica_mean,
+    avg("E_media")::float8 AS e_media_mean,
+    avg("E_superior")::float8 AS e_superior_mean,
+    avg("Salud_cama")::float8 AS salud_cama_mean,
+    avg("Salud_cons")::float8 AS salud_cons_mean,
+    avg("Abasto")::float8 AS abasto_mean,
+    avg("Espacio_ab")::float8 AS espacio_ab_mean,
+    avg("Cultura")::float8 AS cultura_mean,
+    avg("Est_Tpte")::float8 AS est_tpte_mean
+FROM unequality_indicators
+GROUP BY GROUPING SETS ((cve_ent, cve_mun), (cve_sun), ())
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(URBAN_QUALITY_STATS)
+    op.execute(UNEQUALITY_STATS)
+    op.execute("CREATE UNIQUE INDEX ux_mv_urban_quality_stats ON mv_urban_quality_stats (level, key)")
+    op.execute("CREATE UNIQUE INDEX ux_mv_unequality_stats ON mv_unequality_stats (level, key)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_unequality_stats")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_urban_quality_stats")
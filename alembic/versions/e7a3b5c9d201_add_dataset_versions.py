@@ -0,0 +1,38 @@
+"""add dataset versions
+
+Revision ID: e7a3b5c9d201
+Revises: c4d1e9a7f352
+Create Date: 2025-10-14 17:40:05.617023
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3b5c9d201'
+down_revision: Union[str, Sequence[str], None] = 'c4d1e9a7f352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('dataset_versions',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('datasets', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Versión inicial para los datos ya cargados
+    op.execute(
+        "INSERT INTO dataset_versions (datasets, created_at) "
+        "SELECT 'all', coalesce(max(updated_at), now()) FROM urban_quality"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('dataset_versions')
@@ -0,0 +1,84 @@
+"""add dataset changes feed
+
+Revision ID: f2b8c6d4a913
+Revises: e7a3b5c9d201
+Create Date: 2025-10-15 10:21:47.903118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8c6d4a913'
+down_revision: Union[str, Sequence[str], None] = 'e7a3b5c9d201'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRACKED_TABLES = ("urban_quality", "unequality_indicators")
+
+# Triggers por sentencia con tablas de transición: un solo INSERT ... SELECT
+# por cada INSERT/UPDATE/DELETE del ETL, no uno por fila
+RECORD_CHANGES = """
+CREATE FUNCTION record_dataset_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO dataset_changes (table_name, row_id, op)
+        SELECT TG_TABLE_NAME, id, 'I' FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO dataset_changes (table_name, row_id, op)
+        SELECT TG_TABLE_NAME, id, 'U' FROM new_rows;
+    ELSE
+        INSERT INTO dataset_changes (table_name, row_id, op)
+        SELECT TG_TABLE_NAME, id, 'D' FROM old_rows;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGERS = (
+    ("insert", "INSERT", "NEW TABLE AS new_rows"),
+    ("update", "UPDATE", "NEW TABLE AS new_rows"),
+    ("delete", "DELETE", "OLD TABLE AS old_rows"),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las versiones existentes no tienen cambios registrados
+    op.add_column('dataset_versions', sa.Column('changes_recorded', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.alter_column('dataset_versions', 'changes_recorded', server_default=sa.true())
+    op.create_table('dataset_changes',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('version_id', sa.Integer(), nullable=True),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('row_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('op', sa.String(length=1), nullable=False),
+    sa.ForeignKeyConstraint(['version_id'], ['dataset_versions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_dataset_changes_version_id'), 'dataset_changes', ['version_id'], unique=False)
+
+    op.execute(RECORD_CHANGES)
+    for table in TRACKED_TABLES:
+        for name, event, referencing in TRIGGERS:
+            op.execute(
+                f"CREATE TRIGGER {table}_changes_{name} AFTER {event} ON {table} "
+                f"REFERENCING {referencing} FOR EACH STATEMENT "
+                "EXECUTE FUNCTION record_dataset_changes()"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKED_TABLES:
+        for name, _, _ in TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_changes_{name} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS record_dataset_changes()")
+    op.drop_index(op.f('ix_dataset_changes_version_id'), table_name='dataset_changes')
+    op.drop_table('dataset_changes')
+    op.drop_column('dataset_versions', 'changes_recorded')
@@ -0,0 +1,274 @@
+"""Benchmark for the /api/v1 bounding-box queries against ``urban_quality``.
+
+Runs random bounding boxes through the service layer and reports p50/p99
+latency, once with the spatial index enabled and once forcing a sequential
+scan, so the effect of ``ix_urban_quality_point`` can be measured.
+
+With ``--snapshot`` the same bboxes are also answered from the in-memory
+columnar snapshot (``src/services/snapshot.py``) to compare both paths.
+
+Use a scratch database: ``--seed-rows`` inserts synthetic rows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Add repository root to the module search path so that ``src`` imports work
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+# Measure the database path, not the read-through bbox cache
+os.environ.setdefault("BBOX_CACHE_ENABLED", "false")
+
+from src.core.database import SessionLocal  # noqa: E402
+from src.services import service  # noqa: E402
+from src.services.snapshot import UrbanQualitySnapshot  # noqa: E402
+
+
+LOGGER = logging.getLogger("bench_bbox")
+
+# Extent of static/data_inegi.xlsx (Monterrey metropolitan area)
+LAT_RANGE = (25.59, 25.85)
+LON_RANGE = (-100.43, -100.07)
+
+SEED_SQL = """
+INSERT INTO urban_quality (
+	lat, lon, "POBTOT", "GRAPROES", "GRAPROES_F", "GRAPROES_M",
+	"RECUCALL_C", "RAMPAS_C", "PASOPEAT_C", "BANQUETA_C", "GUARNICI_C",
+	"CICLOVIA_C", "CICLOCAR_C", "ALUMPUB_C", "LETRERO_C", "TELPUB_C",
+	"ARBOLES_C", "DRENAJEP_C", "TRANSCOL_C", "ACESOPER_C", "ACESOAUT_C"
+)
+SELECT
+	:lat_min + random() * (:lat_max - :lat_min),
+	:lon_min + random() * (:lon_max - :lon_min),
+	(random() * 500)::int,
+	random() * 16, random() * 16, random() * 16,
+	(random() * 3)::int, (random() * 3)::int, (random() * 3)::int,
+	(random() * 3)::int, (random() * 3)::int, (random() * 3)::int,
+	(random() * 3)::int, (random() * 3)::int, (random() * 3)::int,
+	(random() * 3)::int, (random() * 3)::int, (random() * 3)::int,
+	(random() * 3)::int, (random() * 3)::int, (random() * 3)::int
+FROM generate_series(1, :rows)
+"""
+
+QUERIES: dict[str, Callable[..., list]] = {
+	"population": service.get_population_by_area,
+	"education": service.get_education_by_area,
+	"trees": service.get_trees_by_area,
+}
+
+
+def configure_logging(verbose: bool) -> None:
+	"""Configure basic logging for the benchmark run."""
+
+	level = logging.DEBUG if verbose else logging.INFO
+	logging.basicConfig(
+		level=level,
+		format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+		datefmt="%Y-%m-%d %H:%M:%S",
+	)
+
+
+def seed_rows(db: Session, rows: int) -> None:
+	"""Insert *rows* synthetic points spread over the dataset extent."""
+
+	LOGGER.info("Insertando %d filas sintéticas en urban_quality", rows)
+	db.execute(
+		text(SEED_SQL),
+		{
+			"lat_min": LAT_RANGE[0],
+			"lat_max": LAT_RANGE[1],
+			"lon_min": LON_RANGE[0],
+			"lon_max": LON_RANGE[1],
+			"rows": rows,
+		},
+	)
+	db.commit()
+	db.execute(text("ANALYZE urban_quality"))
+	db.commit()
+
+
+def random_bboxes(count: int, span: float, seed: int) -> List[Tuple[float, float, float, float]]:
+	"""Build *count* random square bboxes of *span* degrees inside the extent."""
+
+	rng = random.Random(seed)
+	boxes = []
+	for _ in range(count):
+		lat_min = rng.uniform(LAT_RANGE[0], LAT_RANGE[1] - span)
+		lon_min = rng.uniform(LON_RANGE[0], LON_RANGE[1] - span)
+		boxes.append((lat_min, lat_min + span, lon_min, lon_min + span))
+	return boxes
+
+
+def percentile(values: List[float], pct: float) -> float:
+	"""Nearest-rank percentile of *values* (already in milliseconds)."""
+
+	ordered = sorted(values)
+	index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+	return ordered[index]
+
+
+def run_queries(
+	db: Session,
+	query: Callable[..., list],
+	boxes: Iterable[Tuple[float, float, float, float]],
+) -> Tuple[List[float], int]:
+	"""Time each bbox query; returns latencies in ms and total rows fetched."""
+
+	latencies: List[float] = []
+	fetched = 0
+	for lat_min, lat_max, lon_min, lon_max in boxes:
+		start = time.perf_counter()
+		rows = query(db, lat_min, lat_max, lon_min, lon_max)
+		latencies.append((time.perf_counter() - start) * 1000)
+		fetched += len(rows)
+	return latencies, fetched
+
+
+def report(label: str, latencies: List[float], fetched: int) -> None:
+	"""Log p50/p99 latency for one benchmark pass."""
+
+	LOGGER.info(
+		"%-10s p50=%8.2f ms | p99=%8.2f ms | media=%8.2f ms | filas/consulta=%d",
+		label,
+		percentile(latencies, 50),
+		percentile(latencies, 99),
+		statistics.fmean(latencies),
+		fetched // max(1, len(latencies)),
+	)
+
+
+def explain(db: Session, box: Tuple[float, float, float, float]) -> None:
+	"""Print the query plan for a bbox so index usage can be verified."""
+
+	lat_min, lat_max, lon_min, lon_max = box
+	stmt = service.select_by_area(
+		service.POPULATION_COLUMNS, lat_min, lat_max, lon_min, lon_max
+	)
+	compiled = stmt.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+	plan = db.execute(text(f"EXPLAIN ANALYZE {compiled}")).scalars().all()
+	LOGGER.info("Plan:\n%s", "\n".join(plan))
+
+
+def run_benchmark(
+	endpoint: str,
+	queries: int,
+	span: float,
+	seed: int,
+	seed_rows_count: Optional[int],
+	compare_seqscan: bool,
+	compare_snapshot: bool,
+) -> None:
+	"""Run the benchmark for the chosen endpoint."""
+
+	query = QUERIES[endpoint]
+	boxes = random_bboxes(queries, span, seed)
+
+	session = SessionLocal()
+	try:
+		if seed_rows_count:
+			seed_rows(session, seed_rows_count)
+
+		total = session.execute(text("SELECT count(*) FROM urban_quality")).scalar_one()
+		LOGGER.info("Filas en urban_quality: %d | bbox=%.3f° | consultas=%d", total, span, queries)
+		explain(session, boxes[0])
+
+		# Warm-up so the first pass does not pay for cold caches alone
+		run_queries(session, query, boxes[: min(10, len(boxes))])
+
+		latencies, fetched = run_queries(session, query, boxes)
+		report("indice", latencies, fetched)
+
+		if compare_seqscan:
+			session.execute(text("SET enable_indexscan = off"))
+			session.execute(text("SET enable_bitmapscan = off"))
+			latencies, fetched = run_queries(session, query, boxes)
+			report("seqscan", latencies, fetched)
+			session.rollback()
+
+		if compare_snapshot:
+			start = time.perf_counter()
+			snapshot = UrbanQualitySnapshot.load(session)
+			LOGGER.info(
+				"Snapshot cargado: %d filas en %.2f s",
+				snapshot.size,
+				time.perf_counter() - start,
+			)
+
+			def snapshot_query(_db, *bbox):
+				return snapshot.query(endpoint, *bbox)
+
+			latencies, fetched = run_queries(session, snapshot_query, boxes)
+			report("snapshot", latencies, fetched)
+	finally:
+		session.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+	"""CLI argument parser."""
+
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument(
+		"--endpoint",
+		choices=sorted(QUERIES),
+		default="population",
+		help="Consulta del servicio a medir.",
+	)
+	parser.add_argument("--queries", type=int, default=200, help="Número de bboxes a consultar.")
+	parser.add_argument("--span", type=float, default=0.01, help="Lado del bbox en grados.")
+	parser.add_argument("--seed", type=int, default=42, help="Semilla para generar los bboxes.")
+	parser.add_argument(
+		"--seed-rows",
+		type=int,
+		help="Inserta N filas sintéticas antes de medir (p. ej. 1000000). Solo en bases de prueba.",
+	)
+	parser.add_argument(
+		"--compare-seqscan",
+		action="store_true",
+		help="Repite la medición deshabilitando index/bitmap scans.",
+	)
+	parser.add_argument(
+		"--snapshot",
+		action="store_true",
+		help="Repite la medición con el snapshot columnar en memoria.",
+	)
+	parser.add_argument(
+		"--verbose",
+		action="store_true",
+		help="Habilita logs detallados para depuración.",
+	)
+	return parser
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+	"""Script entrypoint."""
+
+	parser = build_parser()
+	args = parser.parse_args(list(argv) if argv is not None else None)
+	configure_logging(verbose=args.verbose)
+
+	run_benchmark(
+		endpoint=args.endpoint,
+		queries=args.queries,
+		span=args.span,
+		seed=args.seed,
+		seed_rows_count=args.seed_rows,
+		compare_seqscan=args.compare_seqscan,
+		compare_snapshot=args.snapshot,
+	)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution entrypoint
+	main()
@@ -0,0 +1,191 @@
+"""HTTP load test for the /api/v1 bounding-box endpoints.
+
+Fires random bboxes at a running server with a fixed number of concurrent
+clients and reports throughput (req/s) and p50/p99 latency. Run it once
+against a server started with ``DATABASE_ASYNC=false`` and once with
+``DATABASE_ASYNC=true`` to compare the threadpool and asyncpg paths::
+
+	uvicorn src.app:app --port 8000
+	python scripts/load_test.py --url http://127.0.0.1:8000 --concurrency 200
+
+Turn off the bbox cache on the server (``BBOX_CACHE_ENABLED=false``) to
+measure the database path rather than cache hits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import httpx
+
+
+LOGGER = logging.getLogger("load_test")
+
+ENDPOINTS = ("population", "education", "trees")
+
+# Extent of static/data_inegi.xlsx (Monterrey metropolitan area)
+LAT_RANGE = (25.59, 25.85)
+LON_RANGE = (-100.43, -100.07)
+
+
+def configure_logging(verbose: bool) -> None:
+	"""Configure basic logging for the load test run."""
+
+	level = logging.DEBUG if verbose else logging.INFO
+	logging.basicConfig(
+		level=level,
+		format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+		datefmt="%Y-%m-%d %H:%M:%S",
+	)
+	logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def random_bboxes(count: int, span: float, seed: int) -> List[Tuple[float, float, float, float]]:
+	"""Build *count* random square bboxes of *span* degrees inside the extent."""
+
+	rng = random.Random(seed)
+	boxes = []
+	for _ in range(count):
+		lat_min = rng.uniform(LAT_RANGE[0], LAT_RANGE[1] - span)
+		lon_min = rng.uniform(LON_RANGE[0], LON_RANGE[1] - span)
+		boxes.append((lat_min, lat_min + span, lon_min, lon_min + span))
+	return boxes
+
+
+def percentile(values: List[float], pct: float) -> float:
+	"""Nearest-rank percentile of *values* (already in milliseconds)."""
+
+	ordered = sorted(values)
+	index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+	return ordered[index]
+
+
+async def worker(
+	client: httpx.AsyncClient,
+	path: str,
+	params: dict,
+	boxes: List[Tuple[float, float, float, float]],
+	deadline: float,
+	latencies: List[float],
+	errors: List[int],
+	offset: int,
+) -> None:
+	"""Send requests back to back until *deadline*, cycling through *boxes*."""
+
+	i = offset
+	while time.perf_counter() < deadline:
+		lat_min, lat_max, lon_min, lon_max = boxes[i % len(boxes)]
+		i += 1
+		start = time.perf_counter()
+		try:
+			response = await client.get(
+				path,
+				params={
+					**params,
+					"lat_min": lat_min,
+					"lat_max": lat_max,
+					"lon_min": lon_min,
+					"lon_max": lon_max,
+				},
+			)
+			ok = response.status_code == 200
+		except httpx.HTTPError:
+			ok = False
+		if ok:
+			latencies.append((time.perf_counter() - start) * 1000)
+		else:
+			errors.append(1)
+
+
+async def run_load_test(
+	url: str,
+	endpoint: str,
+	concurrency: int,
+	duration: float,
+	span: float,
+	seed: int,
+	response_format: Optional[str],
+) -> None:
+	"""Run *concurrency* clients for *duration* seconds and log the results."""
+
+	boxes = random_bboxes(1000, span, seed)
+	params = {"format": response_format} if response_format else {}
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	latencies: List[float] = []
+	errors: List[int] = []
+
+	async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+		# Warm-up: abre conexiones y llena el pool del servidor
+		await client.get(f"/api/v1/{endpoint}", params={"lat_min": 0, "lat_max": 0, "lon_min": 0, "lon_max": 0})
+
+		LOGGER.info(
+			"%s/api/v1/%s: %d clientes durante %.0f s (bbox de %.3f°)",
+			url, endpoint, concurrency, duration, span,
+		)
+		start = time.perf_counter()
+		deadline = start + duration
+		await asyncio.gather(*(
+			worker(client, f"/api/v1/{endpoint}", params, boxes, deadline, latencies, errors, n)
+			for n in range(concurrency)
+		))
+		elapsed = time.perf_counter() - start
+
+	if not latencies:
+		LOGGER.error("Ninguna petición exitosa (%d errores)", len(errors))
+		return
+	LOGGER.info(
+		"req/s=%8.1f | p50=%8.2f ms | p99=%8.2f ms | ok=%d | errores=%d",
+		len(latencies) / elapsed,
+		percentile(latencies, 50),
+		percentile(latencies, 99),
+		len(latencies),
+		len(errors),
+	)
+
+
+def build_parser() -> argparse.ArgumentParser:
+	"""CLI argument parser."""
+
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base del servidor.")
+	parser.add_argument("--endpoint", choices=ENDPOINTS, default="population", help="Endpoint a medir.")
+	parser.add_argument("--concurrency", type=int, default=100, help="Clientes concurrentes.")
+	parser.add_argument("--duration", type=float, default=20.0, help="Duración de la prueba en segundos.")
+	parser.add_argument("--span", type=float, default=0.01, help="Lado del bbox en grados.")
+	parser.add_argument("--seed", type=int, default=42, help="Semilla para generar los bboxes.")
+	parser.add_argument("--format", dest="response_format", help="Parámetro `format` de la petición.")
+	parser.add_argument(
+		"--verbose",
+		action="store_true",
+		help="Habilita logs detallados para depuración.",
+	)
+	return parser
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+	"""Script entrypoint."""
+
+	parser = build_parser()
+	args = parser.parse_args(list(argv) if argv is not None else None)
+	configure_logging(verbose=args.verbose)
+
+	asyncio.run(
+		run_load_test(
+			url=args.url,
+			endpoint=args.endpoint,
+			concurrency=args.concurrency,
+			duration=args.duration,
+			span=args.span,
+			seed=args.seed,
+			response_format=args.response_format,
+		)
+	)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution entrypoint
+	main()
@@ -19,6 +19,8 @@ sys.path.insert(0, str(ROOT_DIR))
 from src.core.database import SessionLocal  # noqa: E402
 from src.models.urban_quality import UrbanQuality  # noqa: E402
 from src.models.unequality_indicators import UnequalityIndicators  # noqa: E402
+from src.services.dataset_version import bump_dataset_version  # noqa: E402
+from src.services.stats import refresh_summary_views  # noqa: E402
 
 
 LOGGER = logging.getLogger("loadto_db")
@@ -326,6 +328,7 @@ def run_import(
 		raise ValueError("No se seleccionó ningún dataset para cargar.")
 
 	session = SessionLocal()
+	loaded_labels = []
 	try:
 		for label, path, loader in datasets:
 			if not path.exists():
@@ -341,6 +344,16 @@ def run_import(
 				loaded,
 				skipped,
 			)
+			if loaded:
+				loaded_labels.append(label)
+
+		# Las estadísticas de /api/v1/stats se precalculan sobre los datos recién cargados
+		refresh_summary_views(session)
+		# Nueva versión del dataset: invalida cachés y ETags de /api/v1 y agrupa
+		# los cambios de filas que registraron los triggers (/api/v1/changes)
+		if loaded_labels:
+			version = bump_dataset_version(session, ", ".join(loaded_labels))
+			LOGGER.info("Versión del dataset: %s", version)
 	finally:
 		session.close()
 
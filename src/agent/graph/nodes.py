@@ -3,8 +3,11 @@ from __future__ import annotations
 import json
 import jsonpatch
 from typing import Any, Dict
+from starlette.concurrency import run_in_threadpool
 
 from .state import OrchestratorState, Emit
+from src.core.database import SessionLocal, asyncpg_pool
+from src.services import inequality_index
 from src.services.context_builder import ContextBuilder, meters_to_deg
 from src.agent.llm import LLM
 
@@ -22,6 +25,15 @@ def square_from_point(lat: float, lon: float, size_m: float = 50.0) -> Dict[str,
     return {"type": "Polygon", "coordinates": [coords]}
 
 
+def _get_inequality_index():
+    # Índice en memoria de unequality_indicators (se reconstruye si cambió la versión)
+    db = SessionLocal()
+    try:
+        return inequality_index.get_inequality_index(db)
+    finally:
+        db.close()
+
+
 def _to_dict(x: Any) -> Dict[str, Any]:
     if x is None:
         return {}
@@ -62,20 +74,18 @@ async def run_models_node(state: OrchestratorState, emit: Emit) -> OrchestratorS
     outputs = state.setdefault("model_outputs", {})
     feature_collection = state.setdefault("map_json", {"type": "FeatureCollection", "features": []})
 
-    # DSN desde settings (sync si existe, si no async dsn)
-    from src.core.settings import Settings
-    _settings = Settings()
-    dsn = getattr(_settings, "database_url_sync", None) or _settings.database_url
-    ctx_builder = ContextBuilder(dsn=dsn)
+    # Con INEQUALITY_INDEX_ENABLED el payload de desigualdad sale del STRtree
+    index = None
+    if inequality_index.inequality_index_enabled():
+        index = await run_in_threadpool(_get_inequality_index)
+    # Pool asyncpg de la app (se abre en el lifespan de FastAPI)
+    ctx_builder = ContextBuilder(pool=state.get("db_pool") or asyncpg_pool, inequality_index=index)
 
-    for z in zones:
-        lat = float(z.get("lat"))
-        lon = float(z.get("lon"))
-        geometry = z.get("geometry")  # GeoJSON original
+    # (1) Construye los dos payloads de todas las zonas en una sola consulta
+    payloads = await ctx_builder.build_context_payloads(zones)
 
-        # (1) Construye payloads completos (async en el builder)
-        pop_payload = await ctx_builder.build_population_payload(geometry, lat, lon)
-        ineq_payload = await ctx_builder.build_inequality_payload(geometry, lat, lon)
+    for z in zones:
+        pop_payload, ineq_payload = payloads[z["id"]]
 
         # (2) Llama herramientas MCP
         infra_raw = await mcp.call_tool("City Infrastructure Model", pop_payload)
@@ -10,6 +10,7 @@ class OrchestratorState(TypedDict, total=False):
     # Entradas
     zones: List[Dict[str, Any]]               # [{"id": "...", "lat": ..., "lon": ..., "geometry": {...}}, ...]
     mcp_client: Any                            # Cliente MCP con .call_tool(name, payload)
+    db_pool: Any                               # AsyncpgPool para ContextBuilder (default: asyncpg_pool)
     context: Dict[str, Any]                    # {"filters": {...}, "objectives": [...]}
 
     # Producción intermedia
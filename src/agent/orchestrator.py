@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
+from src.core.database import asyncpg_pool
 from src.core.settings import Settings
 from src.agent.graph import build_graph
 
@@ -52,6 +53,7 @@ async def run_orchestration(
         "zones": zones or [],
         "llm": llm,
         "mcp_client": mcp_client,
+        "db_pool": asyncpg_pool,
         "context": {
             "filters": filters or {},
             "objectives": objectives or [],
@@ -0,0 +1,98 @@
+"""
+GET condicional para /api/v1.
+
+Las respuestas de /api/v1 solo dependen de la versión del dataset y de la
+consulta, así que el ETag se calcula antes de ejecutar el endpoint:
+`W/"v<versión>-<hash de ruta, parámetros ordenados y Accept>"`. Si el cliente
+manda un `If-None-Match` que coincide se responde 304 sin tocar la base.
+
+El ETag es débil: los datos son los mismos, pero el orden de las filas (sin
+ORDER BY, o armadas desde la caché de bboxes) puede cambiar entre respuestas,
+así que los bytes no se garantizan idénticos.
+"""
+
+import hashlib
+from email.utils import format_datetime
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.database import SessionLocal
+from src.services.dataset_version import VersionInfo, cached_version_info, get_version_info
+
+
+def _load_version_info() -> VersionInfo:
+    # Del primario: una réplica atrasada daría 304 con el ETag de la versión anterior
+    db = SessionLocal()
+    try:
+        return get_version_info(db)
+    finally:
+        db.close()
+
+
+def make_etag(version: str, path: str, query_string: str, accept: Optional[str]) -> str:
+    """ETag débil de una consulta: mismo resultado para parámetros en otro orden."""
+    query = urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+    digest = hashlib.sha1(f"{path}?{query}|{accept or ''}".encode("utf-8")).hexdigest()[:16]
+    return f'W/"v{version}-{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    # If-None-Match compara en forma débil: se ignora el prefijo W/
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    tags = [_opaque(tag) for tag in if_none_match.split(",")]
+    return "*" in tags or _opaque(etag) in tags
+
+
+class ConditionalGetMiddleware:
+    """
+    Agrega `ETag` / `Last-Modified` a las respuestas 200 de GET bajo `prefix`
+    y responde 304 a `If-None-Match` vigentes antes de llegar al endpoint.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api/v1"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        info = cached_version_info() or await run_in_threadpool(_load_version_info)
+        request_headers = Headers(scope=scope)
+        etag = make_etag(
+            info.version,
+            scope["path"],
+            scope.get("query_string", b"").decode("latin-1"),
+            request_headers.get("accept"),
+        )
+        headers = {"ETag": etag, "Vary": "Accept"}
+        if info.created_at is not None:
+            headers["Last-Modified"] = format_datetime(info.created_at, usegmt=True)
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
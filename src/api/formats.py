@@ -0,0 +1,133 @@
+"""
+Formatos de respuesta para los endpoints de /api/v1.
+
+El cliente elige el formato con `?format=` o con el header `Accept`:
+- `json` (default): lista de objetos, serializada con orjson
+- `columnar`: un objeto con un arreglo por campo (`{"lat": [...], "lon": [...]}`)
+- `ndjson`: un objeto por línea, en streaming
+- `arrow`: Apache Arrow IPC (stream), requiere `pyarrow`
+"""
+
+from typing import AsyncIterable, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+FORMATS = ("json", "columnar", "ndjson", "arrow")
+
+# Media types que se reconocen en `Accept` (el resto cae en JSON)
+_ACCEPT_FORMATS = {
+    NDJSON_MEDIA_TYPE: "ndjson",
+    ARROW_MEDIA_TYPE: "arrow",
+}
+
+
+def negotiate(request: Request, format: Optional[str]) -> str:
+    """
+    Formato de la respuesta. El parámetro `format` tiene prioridad sobre el
+    header `Accept`; si ninguno pide algo conocido se usa `json`.
+    """
+    if format is not None:
+        fmt = format
+    else:
+        fmt = "json"
+        for part in request.headers.get("accept", "").split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in _ACCEPT_FORMATS:
+                fmt = _ACCEPT_FORMATS[media_type]
+                break
+
+    if fmt == "arrow" and pa is None:
+        raise HTTPException(
+            status_code=406,
+            detail="El formato Arrow no está disponible: falta instalar pyarrow",
+        )
+    return fmt
+
+
+def _ndjson_chunk(rows: Iterable[tuple], fields: Sequence[str]) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+def ndjson_response(
+    partitions: Union[Iterable[List[tuple]], AsyncIterable[List[tuple]]],
+    fields: Sequence[str],
+) -> StreamingResponse:
+    """
+    Respuesta en streaming con un objeto JSON por línea.
+
+    `partitions` es un iterable (sync o async) de bloques de filas (ver
+    `service.stream_by_area`); cada bloque se serializa y se envía como un
+    chunk, de modo que la memoria no depende del tamaño del área. Solo se
+    incluyen los primeros `len(fields)` valores de cada fila.
+    """
+    if hasattr(partitions, "__aiter__"):
+        async def body():
+            async for rows in partitions:
+                yield _ndjson_chunk(rows, fields)
+    else:
+        def body():
+            for rows in partitions:
+                yield _ndjson_chunk(rows, fields)
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _columns(rows: Sequence[tuple], fields: Sequence[str]) -> Dict[str, list]:
+    if not rows:
+        return {field: [] for field in fields}
+    return {field: list(values) for field, values in zip(fields, zip(*rows))}
+
+
+def _arrow_bytes(
+    rows: Sequence[tuple], fields: Sequence[str], types: Mapping[str, type]
+) -> bytes:
+    arrow_types = {int: pa.int64(), float: pa.float64()}
+    columns = _columns(rows, fields)
+    schema = pa.schema([(field, arrow_types.get(types.get(field), pa.float64())) for field in fields])
+    table = pa.Table.from_pydict(columns, schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def render(
+    fmt: str,
+    rows: Sequence[tuple],
+    fields: Sequence[str],
+    types: Mapping[str, type],
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Serializa `rows` (tuplas en el orden de `fields`) en el formato pedido.
+
+    Args:
+        fmt: Uno de `FORMATS`
+        rows: Filas a serializar; valores extra al final de cada fila se ignoran
+        fields: Nombres de los campos
+        types: Tipo de Python (int/float) de cada campo, para el esquema Arrow
+        headers: Headers adicionales de la respuesta
+    """
+    if fmt == "ndjson":
+        response = ndjson_response([rows], fields)
+        response.headers.update(headers or {})
+        return response
+    if fmt == "arrow":
+        content = _arrow_bytes(rows, fields, types)
+        return Response(content=content, media_type=ARROW_MEDIA_TYPE, headers=headers)
+    if fmt == "columnar":
+        content = orjson.dumps(_columns(rows, fields))
+    else:
+        content = orjson.dumps([dict(zip(fields, row)) for row in rows])
+    return Response(content=content, media_type=JSON_MEDIA_TYPE, headers=headers)
@@ -4,25 +4,143 @@ Los endpoints reciben coordenadas lat/lon min/max desde el frontend y devuelven
 datos filtrados por área geográfica.
 """
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Callable, Dict, List, Literal, Optional, Union
 
-from src.core.database import get_db
-from src.services import service
-from src.schemas.urban_quality import PopulationData, EducationData, TreesData
+from src.api import formats
+from src.core.database import get_api_db, get_read_db
+from src.core.settings import get_settings
+from src.services import changes, raster, service, stats, tiles
+from src.utils import mvt
+from src.utils.helpers import decode_cursor, encode_cursor
+from src.schemas.urban_quality import (
+    PopulationData, EducationData, TreesData, GridCell, BatchRequest, BatchResult, PolygonQuery,
+)
 
 # Router con prefijo para todos los endpoints
 router = APIRouter(prefix="/api/v1", tags=["Urban Quality Data"])
 
+FORMAT_QUERY = Query(
+    None,
+    description="Formato de respuesta: `json` (default), `columnar` (un arreglo por campo), "
+                "`ndjson` (streaming, un punto por línea) o `arrow` (Apache Arrow IPC). "
+                "También se acepta `Accept: application/x-ndjson` o "
+                "`Accept: application/vnd.apache.arrow.stream`.",
+)
+ResponseFormat = Optional[Literal["json", "columnar", "ndjson", "arrow"]]
+LIMIT_QUERY = Query(
+    None,
+    ge=1,
+    le=service.MAX_PAGE_SIZE,
+    description="Activa la paginación: número máximo de puntos por página.",
+)
+CURSOR_QUERY = Query(
+    None,
+    description="Cursor opaco de la página siguiente (header `X-Next-Cursor` de la respuesta anterior).",
+)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+SAMPLED_HEADER = "X-Sampled"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+async def _query(db, sync_fn: Callable, async_fn: Callable, *args):
+    """
+    Ejecuta una consulta del servicio con la sesión que entregó `get_api_db`:
+    la versión async sobre una `AsyncSession`, o la sync en el threadpool.
+    """
+    try:
+        if isinstance(db, AsyncSession):
+            return await async_fn(db, *args)
+        return await run_in_threadpool(sync_fn, db, *args)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar datos: {str(e)}")
+
+
+def _cap_points(rows, bbox):
+    """Las filas, o una muestra estratificada si pasan de `MAX_POINTS`."""
+    max_points = get_settings().max_points
+    if max_points and len(rows) > max_points:
+        return service.downsample(rows, *bbox, max_points)
+    return rows
+
+
+def _render_sampled(fmt: str, rows, fields, types, bbox) -> Response:
+    """
+    Serializa una respuesta sin paginar. Si tiene más de `MAX_POINTS` puntos
+    se envía una muestra estratificada (ver `service.downsample`); los headers
+    `X-Sampled` y `X-Total-Count` indican si se muestreó y el total real.
+    """
+    total = len(rows)
+    rows = _cap_points(rows, bbox)
+    headers = {
+        SAMPLED_HEADER: "true" if len(rows) < total else "false",
+        TOTAL_COUNT_HEADER: str(total),
+    }
+    return formats.render(fmt, rows, fields, types, headers)
+
+
+async def _area_response(
+    request: Request,
+    db,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    format: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+):
+    """
+    Resuelve una consulta por área en el modo pedido: paginada (si llega
+    `limit` o `cursor`), en streaming NDJSON o como lista completa.
+    Las filas se serializan directamente en el formato negociado (ver
+    `formats.render`), sin validar cada punto con Pydantic.
+    """
+    fields = service.METRIC_FIELDS[metric]
+    types = service.METRIC_TYPES[metric]
+    fmt = formats.negotiate(request, format)
+    bbox = (lat_min, lat_max, lon_min, lon_max)
+
+    if limit is not None or cursor is not None:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        rows, next_key = await _query(
+            db, service.get_page_by_area, service.get_page_by_area_async,
+            metric, *bbox, limit or service.DEFAULT_PAGE_SIZE, after,
+        )
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(next_key)} if next_key else {}
+        return await run_in_threadpool(formats.render, fmt, rows, fields, types, headers)
+
+    if fmt == "ndjson":
+        # La sesión sigue abierta mientras se envía el stream: FastAPI cierra
+        # las dependencias con yield hasta terminar la respuesta.
+        stream = service.stream_by_area_async if isinstance(db, AsyncSession) else service.stream_by_area
+        return formats.ndjson_response(stream(db, metric, *bbox), fields)
+
+    rows = await _query(db, service.query_area, service.query_area_async, metric, *bbox)
+    # Muestrear y serializar áreas grandes es CPU: fuera del event loop
+    return await run_in_threadpool(_render_sampled, fmt, rows, fields, types, bbox)
+
 
 @router.get("/population", response_model=List[PopulationData])
-def get_population_data(
+async def get_population_data(
+    request: Request,
     lat_min: float = Query(..., description="Latitud mínima del área", example=19.4),
     lat_max: float = Query(..., description="Latitud máxima del área", example=19.5),
     lon_min: float = Query(..., description="Longitud mínima del área", example=-99.2),
     lon_max: float = Query(..., description="Longitud máxima del área", example=-99.1),
-    db: Session = Depends(get_db)
+    format: ResponseFormat = FORMAT_QUERY,
+    limit: Optional[int] = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    db=Depends(get_api_db)
 ):
     """
     **Endpoint 1: Datos de Población Total**
@@ -37,26 +155,35 @@ def get_population_data(
     - **lat_max**: Latitud máxima del rectángulo a consultar
     - **lon_min**: Longitud mínima del rectángulo a consultar
     - **lon_max**: Longitud máxima del rectángulo a consultar
+    - **format**: `json`, `columnar`, `ndjson` (streaming) o `arrow` (opcional)
+    - **limit** / **cursor**: paginación keyset; la respuesta trae el cursor de
+      la página siguiente en el header `X-Next-Cursor` (opcional)
+    
+    Sin paginar, si el área tiene más de `MAX_POINTS` puntos se regresa una
+    muestra repartida en el área (`X-Sampled: true`, total real en
+    `X-Total-Count`). Con `limit` / `cursor` o `ndjson` llegan todos.
     
     **Ejemplo de uso:**
     ```
     GET /api/v1/population?lat_min=19.4&lat_max=19.5&lon_min=-99.2&lon_max=-99.1
     ```
     """
-    try:
-        results = service.get_population_by_area(db, lat_min, lat_max, lon_min, lon_max)
-        return results
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar datos: {str(e)}")
+    return await _area_response(
+        request, db, "population", lat_min, lat_max, lon_min, lon_max, format, limit, cursor,
+    )
 
 
 @router.get("/education", response_model=List[EducationData])
-def get_education_data(
+async def get_education_data(
+    request: Request,
     lat_min: float = Query(..., description="Latitud mínima del área", example=19.4),
     lat_max: float = Query(..., description="Latitud máxima del área", example=19.5),
     lon_min: float = Query(..., description="Longitud mínima del área", example=-99.2),
     lon_max: float = Query(..., description="Longitud máxima del área", example=-99.1),
-    db: Session = Depends(get_db)
+    format: ResponseFormat = FORMAT_QUERY,
+    limit: Optional[int] = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    db=Depends(get_api_db)
 ):
     """
     **Endpoint 2: Datos de Grado Promedio de Escolaridad**
@@ -73,26 +200,35 @@ def get_education_data(
     - **lat_max**: Latitud máxima del rectángulo a consultar
     - **lon_min**: Longitud mínima del rectángulo a consultar
     - **lon_max**: Longitud máxima del rectángulo a consultar
+    - **format**: `json`, `columnar`, `ndjson` (streaming) o `arrow` (opcional)
+    - **limit** / **cursor**: paginación keyset; la respuesta trae el cursor de
+      la página siguiente en el header `X-Next-Cursor` (opcional)
+    
+    Sin paginar, si el área tiene más de `MAX_POINTS` puntos se regresa una
+    muestra repartida en el área (`X-Sampled: true`, total real en
+    `X-Total-Count`). Con `limit` / `cursor` o `ndjson` llegan todos.
     
     **Ejemplo de uso:**
     ```
     GET /api/v1/education?lat_min=19.4&lat_max=19.5&lon_min=-99.2&lon_max=-99.1
     ```
     """
-    try:
-        results = service.get_education_by_area(db, lat_min, lat_max, lon_min, lon_max)
-        return results
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar datos: {str(e)}")
+    return await _area_response(
+        request, db, "education", lat_min, lat_max, lon_min, lon_max, format, limit, cursor,
+    )
 
 
 @router.get("/trees", response_model=List[TreesData])
-def get_trees_data(
+async def get_trees_data(
+    request: Request,
     lat_min: float = Query(..., description="Latitud mínima del área", example=19.4),
     lat_max: float = Query(..., description="Latitud máxima del área", example=19.5),
     lon_min: float = Query(..., description="Longitud mínima del área", example=-99.2),
     lon_max: float = Query(..., description="Longitud máxima del área", example=-99.1),
-    db: Session = Depends(get_db)
+    format: ResponseFormat = FORMAT_QUERY,
+    limit: Optional[int] = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    db=Depends(get_api_db)
 ):
     """
     **Endpoint 3: Datos de Árboles en la Calle**
@@ -107,14 +243,368 @@ def get_trees_data(
     - **lat_max**: Latitud máxima del rectángulo a consultar
     - **lon_min**: Longitud mínima del rectángulo a consultar
     - **lon_max**: Longitud máxima del rectángulo a consultar
+    - **format**: `json`, `columnar`, `ndjson` (streaming) o `arrow` (opcional)
+    - **limit** / **cursor**: paginación keyset; la respuesta trae el cursor de
+      la página siguiente en el header `X-Next-Cursor` (opcional)
+    
+    Sin paginar, si el área tiene más de `MAX_POINTS` puntos se regresa una
+    muestra repartida en el área (`X-Sampled: true`, total real en
+    `X-Total-Count`). Con `limit` / `cursor` o `ndjson` llegan todos.
     
     **Ejemplo de uso:**
     ```
     GET /api/v1/trees?lat_min=19.4&lat_max=19.5&lon_min=-99.2&lon_max=-99.1
     ```
     """
+    return await _area_response(
+        request, db, "trees", lat_min, lat_max, lon_min, lon_max, format, limit, cursor,
+    )
+
+
+@router.get("/{metric}/grid", response_model=List[GridCell])
+async def get_grid_data(
+    metric: Literal["population", "education", "trees"],
+    lat_min: float = Query(..., description="Latitud mínima del área", example=19.4),
+    lat_max: float = Query(..., description="Latitud máxima del área", example=19.5),
+    lon_min: float = Query(..., description="Longitud mínima del área", example=-99.2),
+    lon_max: float = Query(..., description="Longitud máxima del área", example=-99.1),
+    cell_size: float = Query(0.01, gt=0, description="Tamaño de la celda en grados", example=0.01),
+    db=Depends(get_api_db)
+):
+    """
+    **Agregación por celdas para niveles de zoom bajos**
+    
+    En lugar de cada punto, retorna una celda por cada cuadro de `cell_size`
+    grados que tenga datos, con:
+    - `lat`, `lon`: Centro de la celda
+    - `count`: Número de puntos en la celda
+    - `values`: Agregados de la métrica
+        - population: `POBTOT` (suma)
+        - education: `GRAPROES`, `GRAPROES_F`, `GRAPROES_M` (promedio)
+        - trees: `ARBOLES_C` (suma)
+    
+    **Parámetros:**
+    - **metric**: `population`, `education` o `trees`
+    - **lat_min** / **lat_max** / **lon_min** / **lon_max**: Rectángulo a consultar
+    - **cell_size**: Tamaño de la celda en grados (default 0.01 ≈ 1 km)
+    
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/population/grid?lat_min=19.4&lat_max=19.5&lon_min=-99.2&lon_max=-99.1&cell_size=0.005
+    ```
+    """
+    cells = (abs(lat_max - lat_min) / cell_size + 1) * (abs(lon_max - lon_min) / cell_size + 1)
+    if cells > service.MAX_GRID_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"cell_size demasiado pequeño para el área: máximo {service.MAX_GRID_CELLS} celdas",
+        )
+    return await _query(
+        db, service.get_grid_by_area, service.get_grid_by_area_async,
+        metric, lat_min, lat_max, lon_min, lon_max, cell_size,
+    )
+
+
+@router.get("/{metric}/raster", response_class=Response)
+def get_raster_data(
+    metric: Literal["population", "education", "trees"],
+    lat_min: float = Query(..., description="Latitud mínima del área", example=25.6),
+    lat_max: float = Query(..., description="Latitud máxima del área", example=25.8),
+    lon_min: float = Query(..., description="Longitud mínima del área", example=-100.4),
+    lon_max: float = Query(..., description="Longitud máxima del área", example=-100.2),
+    width: int = Query(raster.DEFAULT_RASTER_SIZE, ge=1, le=raster.MAX_RASTER_SIZE, description="Ancho en píxeles"),
+    height: int = Query(raster.DEFAULT_RASTER_SIZE, ge=1, le=raster.MAX_RASTER_SIZE, description="Alto en píxeles"),
+    format: Literal["png", "npy"] = Query("png", description="`png` (heatmap) o `npy` (valores crudos)"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    **Raster de densidad (heatmap) de una métrica**
+
+    Agrupa los puntos del área en una grilla de `width` × `height` píxeles,
+    ponderados por la métrica:
+    - population: `POBTOT` (suma por píxel)
+    - education: `GRAPROES` (promedio por píxel)
+    - trees: `ARBOLES_C` (suma por píxel)
+
+    Con `format=png` retorna una imagen RGBA con rampa de color (píxeles sin
+    datos transparentes) lista para una capa de imagen del mapa; con
+    `format=npy` retorna la grilla float64 (fila 0 = norte) para leerla con
+    `numpy.load`. Los rasters se cachean por bbox, resolución y versión del
+    dataset.
+
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/population/raster?lat_min=25.6&lat_max=25.8&lon_min=-100.4&lon_max=-100.2&width=256&height=256
+    ```
+    """
+    if lat_min == lat_max or lon_min == lon_max:
+        raise HTTPException(status_code=400, detail="El área del raster no puede estar vacía")
     try:
-        results = service.get_trees_by_area(db, lat_min, lat_max, lon_min, lon_max)
-        return results
+        content = raster.get_raster(db, metric, lat_min, lat_max, lon_min, lon_max, width, height, format)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar datos: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al generar raster: {str(e)}")
+    return Response(
+        content=content,
+        media_type=raster.RASTER_FORMATS[format],
+        headers={"Cache-Control": "public, max-age=300"},
+    )
+
+
+@router.post("/batch", response_model=List[BatchResult])
+async def get_batch_data(body: BatchRequest, db=Depends(get_api_db)):
+    """
+    **Varias consultas por área en una sola petición**
+    
+    Recibe una lista de bboxes, cada uno con las métricas a consultar, y los
+    resuelve con una sola sentencia SQL. Útil para cargar varios paneles o
+    capas del mapa a la vez.
+    
+    Retorna una entrada por consulta, en el mismo orden, con:
+    - `id`: El `id` enviado en la consulta (opcional)
+    - `data`: Puntos de cada métrica pedida, con los mismos campos que
+      `/population`, `/education` y `/trees`
+    - `total_count`: Puntos reales de cada métrica en el bbox
+    - `sampled`: `true` si alguna métrica pasó de `MAX_POINTS` y `data` lleva
+      una muestra estratificada (igual que `X-Sampled` en los demás endpoints)
+    
+    **Ejemplo de uso:**
+    ```
+    POST /api/v1/batch
+    {"queries": [
+        {"id": "centro", "lat_min": 25.66, "lat_max": 25.69, "lon_min": -100.33, "lon_max": -100.30,
+         "metrics": ["population", "trees"]},
+        {"id": "sur", "lat_min": 25.60, "lat_max": 25.63, "lon_min": -100.28, "lon_max": -100.25,
+         "metrics": ["education"]}
+    ]}
+    ```
+    """
+    queries = [
+        ((q.lat_min, q.lat_max, q.lon_min, q.lon_max), tuple(dict.fromkeys(q.metrics)))
+        for q in body.queries
+    ]
+    results = await _query(db, service.get_batch_by_area, service.get_batch_by_area_async, queries)
+
+    def entry(q, bbox, result) -> dict:
+        data, total_count = {}, {}
+        for metric, rows in result.items():
+            total_count[metric] = len(rows)
+            data[metric] = [dict(zip(service.METRIC_FIELDS[metric], row)) for row in _cap_points(rows, bbox)]
+        sampled = any(len(data[metric]) < total for metric, total in total_count.items())
+        return {"id": q.id, "data": data, "total_count": total_count, "sampled": sampled}
+
+    def serialize() -> bytes:
+        return orjson.dumps([
+            entry(q, bbox, result)
+            for q, (bbox, _), result in zip(body.queries, queries, results)
+        ])
+
+    return Response(content=await run_in_threadpool(serialize), media_type=formats.JSON_MEDIA_TYPE)
+
+
+@router.post("/query", response_model=List[Dict[str, Optional[Union[int, float]]]])
+async def get_polygon_data(
+    request: Request,
+    body: PolygonQuery,
+    format: ResponseFormat = FORMAT_QUERY,
+    db=Depends(get_api_db)
+):
+    """
+    **Puntos dentro de un polígono**
+    
+    Igual que `/population`, `/education` y `/trees`, pero el área es un
+    Polygon o MultiPolygon GeoJSON (coordenadas `[lon, lat]`) en lugar de un
+    rectángulo. Se consulta el bbox del polígono y se descartan los puntos
+    fuera de él, así que las zonas irregulares no traen puntos de más.
+    
+    **Parámetros:**
+    - **metric**: `population`, `education` o `trees`
+    - **geometry**: Polygon o MultiPolygon GeoJSON
+    - **format**: `json`, `columnar`, `ndjson` o `arrow` (opcional)
+    
+    **Ejemplo de uso:**
+    ```
+    POST /api/v1/query
+    {"metric": "population",
+     "geometry": {"type": "Polygon", "coordinates": [[[-100.33, 25.66], [-100.30, 25.66], [-100.31, 25.69], [-100.33, 25.66]]]}}
+    ```
+    """
+    fmt = formats.negotiate(request, format)
+    try:
+        polygon = service.parse_polygon(body.geometry.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = await _query(db, service.query_polygon, service.query_polygon_async, body.metric, polygon)
+    lon_min, lat_min, lon_max, lat_max = polygon.bounds
+    return await run_in_threadpool(
+        _render_sampled, fmt, rows, service.METRIC_FIELDS[body.metric], service.METRIC_TYPES[body.metric],
+        (lat_min, lat_max, lon_min, lon_max),
+    )
+
+
+@router.get("/nearest", response_model=List[Dict[str, Optional[Union[int, float]]]])
+async def get_nearest_data(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitud del punto", example=25.67),
+    lon: float = Query(..., ge=-180, le=180, description="Longitud del punto", example=-100.31),
+    k: int = Query(10, ge=1, le=service.MAX_NEAREST, description="Número de puntos a retornar"),
+    format: ResponseFormat = FORMAT_QUERY,
+    db=Depends(get_api_db)
+):
+    """
+    **Puntos más cercanos a una ubicación**
+
+    Retorna los `k` puntos censales más cercanos a (`lat`, `lon`), del más
+    cercano al más lejano, con todos sus atributos (`POBTOT`, `GRAPROES`,
+    `GRAPROES_F`, `GRAPROES_M`, `ARBOLES_C`) y `distance_m`, la distancia en
+    metros. No hace falta adivinar un bbox alrededor del clic.
+
+    **Parámetros:**
+    - **lat** / **lon**: Punto de consulta
+    - **k**: Número de puntos (default 10, máximo 1000)
+    - **format**: `json`, `columnar`, `ndjson` o `arrow` (opcional)
+
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/nearest?lat=25.67&lon=-100.31&k=5
+    ```
+    """
+    fmt = formats.negotiate(request, format)
+    rows = await _query(db, service.get_nearest, service.get_nearest_async, lat, lon, k)
+    return await run_in_threadpool(formats.render, fmt, rows, service.NEAREST_FIELDS, service.NEAREST_TYPES)
+
+
+@router.get("/changes", response_model=Dict[str, Any])
+async def get_changes_data(
+    dataset: Literal["urban_quality", "unequality_indicators"] = Query(
+        ..., description="Dataset a sincronizar", example="urban_quality"
+    ),
+    since: int = Query(..., ge=0, description="Versión del dataset que ya tiene el cliente", example=3),
+    db=Depends(get_api_db)
+):
+    """
+    **Cambios del dataset desde una versión**
+
+    Retorna solo lo que cambió desde la versión `since` (el número de versión
+    viene en el `ETag` de las respuestas de /api/v1, `W/"v<versión>-..."`):
+    - `version`: Versión actual; usarla como `since` en la siguiente consulta
+    - `inserted` / `updated`: Filas completas (con `id`) nuevas o modificadas
+    - `deleted`: Ids de las filas borradas
+
+    Si no hay cambios registrados desde `since` (solo se conservan los de las
+    últimas `CHANGES_HISTORY_VERSIONS` versiones) o son más de
+    `CHANGES_MAX_ROWS` filas, responde **410**: el cliente debe descargar el
+    dataset completo.
+
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/changes?dataset=urban_quality&since=3
+    ```
+    """
+    result = await _query(db, changes.get_changes, changes.get_changes_async, dataset, since)
+    if result is None:
+        raise HTTPException(
+            status_code=410,
+            detail=f"No hay cambios disponibles desde la versión {since}; descarga el dataset completo",
+        )
+    # default=str: asyncpg entrega los ids con su propio tipo UUID
+    content = await run_in_threadpool(orjson.dumps, result, default=str)
+    return Response(content=content, media_type=formats.JSON_MEDIA_TYPE)
+
+
+@router.get("/stats", response_model=List[Dict[str, Any]])
+async def get_stats_data(
+    dataset: Literal["urban_quality", "unequality_indicators"] = Query(
+        ..., description="Dataset a resumir", example="urban_quality"
+    ),
+    level: str = Query(
+        "total",
+        description="Nivel de agregación: `total` o `region` (urban_quality); "
+                    "`total`, `sun` o `municipality` (unequality_indicators)",
+        example="region",
+    ),
+    key: Optional[str] = Query(
+        None, description="Clave de un grupo, p. ej. `19039` para un municipio", example="19039"
+    ),
+    db=Depends(get_api_db)
+):
+    """
+    **Estadísticas resumidas precalculadas**
+    
+    Retorna totales y distribuciones por grupo sin descargar los puntos:
+    - urban_quality (por región de 0.05° o total): `points`, `pobtot_sum`,
+      `graproes_mean` (y por sexo), `arboles_sum` y percentiles `arboles_p25`
+      a `arboles_p90`
+    - unequality_indicators (por municipio, SUN o total): `zones`,
+      `pobtot_sum` y el promedio de cada indicador
+    
+    Los valores vienen de vistas materializadas que se actualizan en cada
+    carga del ETL.
+    
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/stats?dataset=urban_quality&level=region
+    ```
+    """
+    _, levels = stats.STATS_VIEWS[dataset]
+    if level not in levels:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Nivel no válido para {dataset}: {level}. Opciones: {list(levels)}",
+        )
+    return await _query(db, stats.get_stats, stats.get_stats_async, dataset, level, key)
+
+
+@router.get("/tiles/{z}/{x}/{y}.mvt", response_class=Response)
+def get_tile(
+    z: int,
+    x: int,
+    y: int,
+    attrs: Optional[str] = Query(
+        None,
+        description="Atributos separados por coma (default: POBTOT,GRAPROES,ARBOLES_C)",
+        example="POBTOT,ARBOLES_C",
+    ),
+    db: Session = Depends(get_read_db)
+):
+    """
+    **Vector tiles (Mapbox Vector Tile) de los puntos de Urban Quality**
+    
+    Retorna el tile `z/x/y` (esquema XYZ, Web Mercator) con una capa
+    `urban_quality` de puntos y los atributos pedidos. Los tiles se cachean por
+    versión del dataset.
+
+    Zooms válidos: 5 a 22. Un tile con más de 20,000 puntos lleva una muestra
+    espacialmente estratificada.
+    
+    **Parámetros:**
+    - **z** / **x** / **y**: Coordenadas del tile
+    - **attrs**: Atributos a incluir, p. ej. `POBTOT,GRAPROES,ARBOLES_C`
+    
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/tiles/12/903/1751.mvt?attrs=POBTOT,ARBOLES_C
+    ```
+    """
+    if not tiles.MIN_ZOOM <= z <= tiles.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail=f"Tile fuera de rango: {z}/{x}/{y}")
+
+    attributes = tiles.DEFAULT_TILE_ATTRIBUTES
+    if attrs:
+        attributes = tuple(dict.fromkeys(a.strip() for a in attrs.split(",") if a.strip()))
+        unknown = [a for a in attributes if a not in tiles.TILE_ATTRIBUTES]
+        if unknown or not attributes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Atributos no válidos: {unknown}. Opciones: {list(tiles.TILE_ATTRIBUTES)}",
+            )
+
+    try:
+        tile = tiles.get_tile(db, z, x, y, attributes)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar tile: {str(e)}")
+    return Response(
+        content=tile,
+        media_type=mvt.MEDIA_TYPE,
+        headers={"Cache-Control": "public, max-age=300"},
+    )
@@ -1,24 +1,76 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from src.core.settings import get_settings
+from src.core.database import SessionLocal, asyncpg_pool, dispose_async_engine, pool_stats, replicas
 from src.api.routes import router
+from src.services import inequality_index, snapshot
+from src.services.service import bbox_cache_stats
 from src.api import api_router
+from src.api.conditional import ConditionalGetMiddleware
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _load_snapshot():
+    db = SessionLocal()
+    try:
+        snapshot.load_snapshot(db)
+    finally:
+        db.close()
+
+
+def _load_inequality_index():
+    db = SessionLocal()
+    try:
+        inequality_index.load_inequality_index(db)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Primer health check de las réplicas antes de recibir tráfico
+    await run_in_threadpool(replicas.start)
+    # Con SNAPSHOT_ENABLED el dataset se carga en memoria antes de recibir tráfico
+    if snapshot.snapshot_enabled():
+        await run_in_threadpool(_load_snapshot)
+    if inequality_index.inequality_index_enabled():
+        await run_in_threadpool(_load_inequality_index)
+    # Pool asyncpg compartido por las consultas del agente (ContextBuilder).
+    # Si la base no responde aún se abre en la primera consulta.
+    try:
+        await asyncpg_pool.open()
+    except Exception as e:
+        LOGGER.warning("No se pudo abrir el pool asyncpg: %s", e)
+    yield
+    await asyncpg_pool.close()
+    await dispose_async_engine()
+    replicas.stop()
+
 
 app = FastAPI(
     title="NASA Space Apps - Urban EarthLens",
     description="API para consultar datos de calidad urbana filtrados por área geográfica",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 settings = get_settings()
 
+# ETag / 304 en /api/v1; se registra antes que CORS para que los 304 también
+# lleven los encabezados CORS
+app.add_middleware(ConditionalGetMiddleware, prefix="/api/v1")
 app.add_middleware(
     CORSMiddleware,
     allow_origins = settings.allowed_origins or ["*"],
     allow_credentials = settings.allowed_credential,
     allow_methods = settings.allowed_methods or ["*"],
-    allow_headers = settings.allowed_headers or ["*"]
+    allow_headers = settings.allowed_headers or ["*"],
+    expose_headers = ["X-Next-Cursor", "X-Sampled", "X-Total-Count", "ETag", "Last-Modified"]
 )
 
 # Registrar los endpoints de Urban Quality
@@ -43,5 +95,9 @@ def health():
             "port": settings.database_port,
             "pool_size": settings.database_pool_size,
             "max_overflow": settings.database_max_overflow,
-        }
+            "pool": pool_stats(),
+        },
+        "bbox_cache": bbox_cache_stats(),
+        "snapshot": snapshot.snapshot_stats(),
+        "inequality_index": inequality_index.inequality_index_stats(),
     }
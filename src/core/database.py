@@ -1,19 +1,482 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+import asyncpg
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
+from src.core.settings import get_settings
+
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=True)
+LOGGER = logging.getLogger(__name__)
+
+
+class PoolWaitStats:
+    """Tiempo que tardan los checkouts del pool (espera + conexión nueva + pre-ping)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / attempts * 1000, 3) if attempts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class _TimedPool:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options() -> dict:
+    # Opciones comunes de los motores sync y async, tomadas de settings. El
+    # tamaño es por proceso: con N workers de gunicorn hay hasta
+    # N * (pool_size + max_overflow) conexiones abiertas contra Postgres.
+    settings = get_settings()
+    return {
+        "echo": settings.database_echo,
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_timeout": settings.database_pool_timeout,
+        "pool_recycle": settings.database_pool_recycle,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+
+
+class ReplicaRouter:
+    """
+    Reparte las lecturas entre las réplicas en round-robin.
+
+    Un hilo revisa cada `interval` segundos que cada réplica responda
+    (`SELECT 1`); las que fallan se saltan hasta que vuelven a responder. Si
+    no hay réplicas sanas, `choose` regresa None y se usa el primario.
+
+    `start` se llama solo desde el lifespan de la app: hasta entonces (o en
+    procesos que no lo llaman) todas las lecturas van al primario, y `choose`
+    nunca hace health checks bloqueantes desde una request.
+    """
+
+    def __init__(self, urls: List[str], interval: float):
+        self.urls = list(urls)
+        self.interval = interval
+        self.engines = [
+            create_engine(url, poolclass=TimedQueuePool, **_engine_options()) for url in self.urls
+        ]
+        self.healthy = [True] * len(self.urls)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def choose(self) -> Optional[int]:
+        """Índice de la siguiente réplica sana, o None (sin réplicas o sin arrancar)."""
+        if not self.engines or self._thread is None:
+            return None
+        start = next(self._counter)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self.healthy[index]:
+                return index
+        return None
+
+    def check(self) -> None:
+        for index, replica in enumerate(self.engines):
+            try:
+                with replica.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                healthy = True
+            except Exception as e:
+                healthy = False
+                if self.healthy[index]:
+                    LOGGER.warning("Réplica %s no responde: %s", self._host(index), e)
+            if healthy and not self.healthy[index]:
+                LOGGER.info("Réplica %s disponible de nuevo", self._host(index))
+            self.healthy[index] = healthy
+
+    def start(self) -> None:
+        """Revisa las réplicas una vez y arranca el hilo de health checks."""
+        with self._lock:
+            if self._thread is not None or not self.engines:
+                return
+            self.check()
+            self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el hilo de health checks y cierra las conexiones de las réplicas."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._stop.clear()
+        for replica in self.engines:
+            replica.dispose()
+
+    def status(self) -> List[dict]:
+        return [
+            {"host": self._host(index), "healthy": self.healthy[index], **_pool_status(replica.pool)}
+            for index, replica in enumerate(self.engines)
+        ]
+
+    def _host(self, index: int) -> str:
+        url = make_url(self.urls[index])
+        return f"{url.host or 'localhost'}:{url.port or 5432}/{url.database}"
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+DATABASE_URL = get_settings().assembled_database_url
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **_engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+replicas = ReplicaRouter(
+    get_settings().database_replica_urls or [],
+    get_settings().database_replica_check_interval,
+)
+
+# Motor async (asyncpg) para /api/v1 cuando DATABASE_ASYNC=true. Se crea la
+# primera vez que se usa: sus conexiones quedan ligadas al event loop activo.
+_async_engine = None
+_async_replica_engines = []
+_AsyncSessionLocal = None
+_AsyncReadSessionLocal = None
+
+
+class RoutingSession(Session):
+    """
+    Session de lectura: las consultas van a una réplica (la misma durante
+    toda la sesión) y los flush/INSERT/UPDATE/DELETE al primario.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # `bind_arguments={"bind": engine}` fuerza un motor (p. ej. el primario)
+        if kw.get("bind") is not None:
+            return kw["bind"]
+        if self._flushing or isinstance(clause, UpdateBase):
+            return self._primary_bind()
+        if "replica" not in self.info:
+            self.info["replica"] = replicas.choose()
+        index = self.info["replica"]
+        return self._primary_bind() if index is None else self._replica_bind(index)
+
+    def _primary_bind(self):
+        return engine
+
+    def _replica_bind(self, index: int):
+        return replicas.engines[index]
+
+
+class AsyncRoutingSession(RoutingSession):
+    # Igual que RoutingSession, con los motores asyncpg (AsyncSession pide el
+    # `sync_engine` de cada uno)
+
+    def _primary_bind(self):
+        return _async_engine.sync_engine
+
+    def _replica_bind(self, index: int):
+        return _async_replica_engines[index].sync_engine
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
+def async_database_url(url: str) -> str:
+    # Misma base que DATABASE_URL, con el driver asyncpg
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def _create_async_engine(url: str):
+    return create_async_engine(async_database_url(url), poolclass=TimedAsyncQueuePool, **_engine_options())
+
+
+def get_async_sessionmaker(read_only: bool = False) -> async_sessionmaker:
+    """
+    Sessionmaker async del primario o, con `read_only`, de sesiones que
+    leen de las réplicas (ver `RoutingSession`).
+    """
+    global _async_engine, _async_replica_engines, _AsyncSessionLocal, _AsyncReadSessionLocal
+    if _AsyncSessionLocal is None:
+        _async_engine = _create_async_engine(DATABASE_URL)
+        _async_replica_engines = [_create_async_engine(url) for url in replicas.urls]
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+        _AsyncReadSessionLocal = async_sessionmaker(
+            sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False
+        )
+    return _AsyncReadSessionLocal if read_only else _AsyncSessionLocal
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_replica_engines, _AsyncSessionLocal, _AsyncReadSessionLocal
+    for async_engine in [_async_engine, *_async_replica_engines]:
+        if async_engine is not None:
+            await async_engine.dispose()
+    _async_engine = None
+    _async_replica_engines = []
+    _AsyncSessionLocal = None
+    _AsyncReadSessionLocal = None
+
+
+class StatementStats:
+    """
+    Tiempos por sentencia registrada en `AsyncpgPool`. `first` es la primera
+    ejecución en cada conexión (Parse + plan + ejecución); `execute`, las
+    siguientes, que reutilizan la sentencia ya preparada. La diferencia entre
+    ambos promedios es lo que cuesta parsear y planear la consulta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def record(self, name: str, seconds: float, first: bool = False) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(
+                name, {"first": 0, "first_total": 0.0, "executes": 0, "execute_total": 0.0, "execute_max": 0.0}
+            )
+            if first:
+                entry["first"] += 1
+                entry["first_total"] += seconds
+            else:
+                entry["executes"] += 1
+                entry["execute_total"] += seconds
+                entry["execute_max"] = max(entry["execute_max"], seconds)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "prepares": entry["first"],
+                    "first_avg_ms": round(entry["first_total"] / entry["first"] * 1000, 3) if entry["first"] else 0.0,
+                    "executes": entry["executes"],
+                    "execute_avg_ms": round(entry["execute_total"] / entry["executes"] * 1000, 3) if entry["executes"] else 0.0,
+                    "execute_max_ms": round(entry["execute_max"] * 1000, 3),
+                }
+                for name, entry in self._stats.items()
+            }
+
+
+class RegistryConnection(asyncpg.Connection):
+    # Conexión del pool asyncpg que recuerda qué sentencias registradas ya
+    # preparó. Las sentencias viven en el statement cache de asyncpg de la
+    # conexión, que sobrevive al reset con que el pool la libera.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements: Set[str] = set()
+
+
+class AsyncpgPool:
+    """
+    Pool asyncpg del proceso para las consultas crudas del agente
+    (`ContextBuilder`). Se abre en el lifespan de la app (o la primera vez
+    que se usa) y se cierra al apagar; `acquire` mide cuánto se espera por
+    una conexión, igual que los pools de SQLAlchemy.
+
+    Las consultas frecuentes se registran con `register(name, sql)` y se
+    ejecutan con `fetch(con, name, ...)`: cada conexión las prepara la primera
+    vez que las usa y después sólo manda Bind/Execute, sin volver a parsearlas
+    ni planearlas (ver `StatementStats`).
+    """
+
+    def __init__(self, url: str):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.pool: Optional[asyncpg.Pool] = None
+        self.wait_stats = PoolWaitStats()
+        self.statements: Dict[str, str] = {}
+        self.statement_stats = StatementStats()
+        self._lock = asyncio.Lock()
+
+    def register(self, name: str, sql: str) -> str:
+        """Registra `sql` como sentencia preparada `name`; regresa el nombre."""
+        if self.statements.get(name, sql) != sql:
+            raise ValueError(f"Sentencia '{name}' ya registrada con otro SQL")
+        self.statements[name] = sql
+        return name
+
+    async def fetch(self, connection, name: str, *args) -> List[asyncpg.Record]:
+        """Ejecuta la sentencia registrada `name` en `connection` (de `acquire`)."""
+        first = name not in connection.prepared_statements
+        start = time.perf_counter()
+        # asyncpg prepara la consulta la primera vez y la guarda en el cache
+        # de la conexión (también vuelve a prepararla si cambia el esquema)
+        records = await connection.fetch(self.statements[name], *args)
+        self.statement_stats.record(name, time.perf_counter() - start, first=first)
+        connection.prepared_statements.add(name)
+        return records
+
+    async def open(self) -> asyncpg.Pool:
+        async with self._lock:
+            if self.pool is None:
+                settings = get_settings()
+                self.pool = await asyncpg.create_pool(
+                    self.dsn,
+                    min_size=settings.asyncpg_pool_min_size,
+                    max_size=settings.asyncpg_pool_max_size,
+                    # asyncpg no acepta negativos (p. ej. -1 como en DATABASE_POOL_RECYCLE)
+                    max_inactive_connection_lifetime=max(0, settings.asyncpg_pool_max_inactive_lifetime),
+                    connection_class=RegistryConnection,
+                    # Sin caducidad: las sentencias registradas siguen preparadas
+                    # mientras viva la conexión (asyncpg las descarta a los 300 s)
+                    max_cached_statement_lifetime=0,
+                )
+            return self.pool
+
+    @asynccontextmanager
+    async def acquire(self):
+        pool = self.pool or await self.open()
+        start = time.perf_counter()
+        try:
+            connection = await pool.acquire(timeout=get_settings().database_pool_timeout)
+        except asyncio.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        try:
+            yield connection
+        finally:
+            await pool.release(connection)
+
+    async def close(self, timeout: float = 10) -> None:
+        """Espera a que se liberen las conexiones en uso; pasado `timeout` las corta."""
+        async with self._lock:
+            pool, self.pool = self.pool, None
+        if pool is None:
+            return
+        try:
+            await asyncio.wait_for(pool.close(), timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning("El pool asyncpg no cerró en %ss; terminando conexiones", timeout)
+            pool.terminate()
+
+    def status(self) -> Optional[dict]:
+        if self.pool is None:
+            return None
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            **self.wait_stats.as_dict(),
+            "statements": self.statement_stats.as_dict(),
+        }
+
+
+asyncpg_pool = AsyncpgPool(DATABASE_URL)
+
+
+def _pool_status(pool) -> dict:
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Negativo mientras el pool no ha abierto todas sus conexiones base
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        "timeout": pool.timeout(),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        status.update(wait_stats.as_dict())
+    return status
+
+
+def pool_stats() -> dict:
+    """Estado de los pools del proceso: conexiones en uso, overflow y espera."""
+    stats = {"sync": _pool_status(engine.pool)}
+    if _async_engine is not None:
+        stats["async"] = _pool_status(_async_engine.sync_engine.pool)
+    if replicas.engines:
+        stats["replicas"] = replicas.status()
+    if _async_replica_engines:
+        stats["async_replicas"] = [
+            _pool_status(async_engine.sync_engine.pool) for async_engine in _async_replica_engines
+        ]
+    if asyncpg_pool.pool is not None:
+        stats["asyncpg"] = asyncpg_pool.status()
+    return stats
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    # Sesión de solo lectura: usa las réplicas si están configuradas
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_api_db():
+    # Sesión de lectura para los endpoints async de /api/v1: AsyncSession con
+    # DATABASE_ASYNC=true, si no una Session sync (las consultas corren en el
+    # threadpool). En ambos casos las consultas van a las réplicas.
+    if get_settings().database_async:
+        async with get_async_sessionmaker(read_only=True)() as db:
+            yield db
+    else:
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
@@ -35,6 +35,42 @@ class Settings(BaseSettings):
     database_password: str = Field(..., alias="DATABASE_PASSWORD")
     database_pool_size: int = Field(5, alias="DATABASE_POOL_SIZE")
     database_max_overflow: int = Field(5, alias="DATABASE_MAX_OVERFLOW")
+    database_pool_timeout: float = Field(30, alias="DATABASE_POOL_TIMEOUT")  # segundos esperando conexión
+    database_pool_recycle: int = Field(1800, alias="DATABASE_POOL_RECYCLE")  # segundos; -1 desactiva
+    database_pool_pre_ping: bool = Field(True, alias="DATABASE_POOL_PRE_PING")
+    database_echo: bool = Field(False, alias="DATABASE_ECHO")  # loguea cada sentencia SQL
+    # Réplicas de solo lectura para /api/v1 (coma-separadas o JSON)
+    database_replica_urls: Optional[List[str]] = Field(default=None, alias="DATABASE_REPLICA_URLS")
+    database_replica_check_interval: float = Field(10, alias="DATABASE_REPLICA_CHECK_INTERVAL")  # segundos
+    database_async: bool = Field(False, alias="DATABASE_ASYNC")  # /api/v1 con asyncpg
+    # Pool asyncpg del agente (ContextBuilder)
+    asyncpg_pool_min_size: int = Field(1, alias="ASYNCPG_POOL_MIN_SIZE")
+    asyncpg_pool_max_size: int = Field(10, alias="ASYNCPG_POOL_MAX_SIZE")
+    # Segundos que una conexión ociosa sigue abierta; 0 (o negativo) la deja abierta
+    asyncpg_pool_max_inactive_lifetime: float = Field(300, alias="ASYNCPG_POOL_MAX_INACTIVE_LIFETIME")
+
+    # === DATASET / CACHÉS ===
+    dataset_version_ttl: int = Field(30, alias="DATASET_VERSION_TTL")  # segundos
+    # /api/v1/changes: versiones con cambios que se conservan y máximo de
+    # filas por respuesta (más antiguo o más grande → 410, descargar todo)
+    changes_history_versions: int = Field(20, alias="CHANGES_HISTORY_VERSIONS")
+    changes_max_rows: int = Field(100_000, alias="CHANGES_MAX_ROWS")
+    tile_cache_size: int = Field(2048, alias="TILE_CACHE_SIZE")  # tiles en memoria
+    tile_cache_dir: Optional[str] = Field(None, alias="TILE_CACHE_DIR")
+    raster_cache_size: int = Field(256, alias="RASTER_CACHE_SIZE")  # rasters en memoria
+    # Caché de bboxes por proceso (cada worker tiene la suya): guarda filas de
+    # Python, ~200-300 bytes cada una, así que BBOX_CACHE_MAX_ROWS=250000 son
+    # ~50-75 MB por worker. Apagada por default, igual que SNAPSHOT_ENABLED.
+    bbox_cache_enabled: bool = Field(False, alias="BBOX_CACHE_ENABLED")
+    bbox_cache_cell_size: float = Field(0.01, alias="BBOX_CACHE_CELL_SIZE")  # grados
+    bbox_cache_max_rows: int = Field(250_000, alias="BBOX_CACHE_MAX_ROWS")
+    bbox_cache_ttl: int = Field(300, alias="BBOX_CACHE_TTL")  # segundos
+    snapshot_enabled: bool = Field(False, alias="SNAPSHOT_ENABLED")
+    # STRtree de los polígonos de unequality_indicators para el agente
+    inequality_index_enabled: bool = Field(False, alias="INEQUALITY_INDEX_ENABLED")
+    # Máximo de puntos por respuesta de /api/v1 sin paginar; arriba de eso se
+    # regresa una muestra (0 = sin límite)
+    max_points: int = Field(50_000, alias="MAX_POINTS")
 
     # === CORS ===
     allowed_origins: Optional[List[str]] = Field(default=None, alias="ALLOWED_ORIGINS")
@@ -55,7 +91,9 @@ class Settings(BaseSettings):
     
 
     # Permite pasar listas coma-separadas o JSON
-    @field_validator("allowed_origins", "allowed_methods", "allowed_headers", mode="before")
+    @field_validator(
+        "allowed_origins", "allowed_methods", "allowed_headers", "database_replica_urls", mode="before"
+    )
     @classmethod
     def split_comma_or_json(cls, v):
         if v is None or isinstance(v, list):
@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Integer, String, func, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from src.core.database import Base
+
+
+class DatasetVersion(Base):
+    # Una fila por cada carga de scripts/loadto_db.py; el id más alto es la
+    # versión vigente de los datos que sirve /api/v1
+    __tablename__ = "dataset_versions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    datasets: Mapped[str] = mapped_column(String(64), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # False para las versiones anteriores al registro de cambios (migración
+    # f2b8c6d4a913): /api/v1/changes no puede dar el delta desde ellas
+    changes_recorded: Mapped[bool] = mapped_column(
+        Boolean, server_default=text("true"), nullable=False
+    )
+
+
+class DatasetChange(Base):
+    # Cambio de una fila de urban_quality / unequality_indicators. Lo escriben
+    # los triggers de la migración f2b8c6d4a913 con version_id NULL (pendiente)
+    # y `bump_dataset_version` lo asigna a la versión nueva.
+    __tablename__ = "dataset_changes"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    version_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("dataset_versions.id", ondelete="CASCADE"), index=True
+    )
+    table_name: Mapped[str] = mapped_column(String(64), nullable=False)
+    row_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    op: Mapped[str] = mapped_column(String(1), nullable=False)  # I, U o D
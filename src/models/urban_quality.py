@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Float, Integer
+from sqlalchemy import Float, Integer, Index, func
 from src.core.models import UUIDPrimaryKey, Timestamp
 from src.core.database import Base
 
@@ -30,3 +30,20 @@ class UrbanQuality(Base, UUIDPrimaryKey, Timestamp):
     TRANSCOL_C: Mapped[int] = mapped_column(Integer)
     ACESOPER_C: Mapped[int] = mapped_column(Integer)
     ACESOAUT_C: Mapped[int] = mapped_column(Integer)
+
+
+# Índice espacial (GiST) sobre point(lon, lat); ver migración 3f9a1c7e2b54.
+# Las consultas deben filtrar con la misma expresión para que Postgres lo use.
+Index(
+    "ix_urban_quality_point",
+    func.point(UrbanQuality.lon, UrbanQuality.lat),
+    postgresql_using="gist",
+)
+
+# Orden estable para la paginación keyset; ver migración 8b2e6d0f4a17.
+Index(
+    "ix_urban_quality_lat_lon_id",
+    UrbanQuality.lat,
+    UrbanQuality.lon,
+    UrbanQuality.id,
+)
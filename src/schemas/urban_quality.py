@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, List, Literal, Optional, Union
 from uuid import UUID
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.schemas.agent import Geometry
 
 class UrbanQualityBase(BaseModel):
     lat: float
@@ -95,3 +97,39 @@ class TreesData(BaseModel):
     ARBOLES_C: Optional[int] = None
     
     model_config = ConfigDict(from_attributes=True)
+
+
+class GridCell(BaseModel):
+    """Celda agregada de /{metric}/grid"""
+    lat: float
+    lon: float
+    count: int
+    values: Dict[str, Optional[Union[int, float]]]
+
+
+class BatchQuery(BaseModel):
+    """Una consulta de /batch: un bbox y las métricas a obtener en él"""
+    id: Optional[str] = None
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+    metrics: List[Literal["population", "education", "trees"]] = Field(..., min_length=1)
+
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=50)
+
+
+class BatchResult(BaseModel):
+    """Resultado de una consulta de /batch, con los puntos de cada métrica"""
+    id: Optional[str] = None
+    data: Dict[str, List[Dict[str, Optional[Union[int, float]]]]]
+    total_count: Dict[str, int]
+    sampled: bool
+
+
+class PolygonQuery(BaseModel):
+    """Consulta de /query: puntos de una métrica dentro de un Polygon/MultiPolygon GeoJSON"""
+    metric: Literal["population", "education", "trees"]
+    geometry: Geometry
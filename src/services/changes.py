@@ -0,0 +1,146 @@
+"""
+Feed de cambios entre versiones del dataset.
+
+Los triggers de la migración f2b8c6d4a913 registran en `dataset_changes`
+cada fila insertada, actualizada o borrada de `urban_quality` y
+`unequality_indicators`, y `bump_dataset_version` asigna esos cambios a la
+versión de la carga. `/api/v1/changes?since=<versión>` regresa el cambio neto
+de cada fila desde esa versión, así que un cliente con los datos de la
+versión `since` se sincroniza sin volver a descargar todo.
+
+El feed está acotado: se conservan los cambios de las últimas
+`CHANGES_HISTORY_VERSIONS` versiones (`bump_dataset_version` borra los
+anteriores) y una respuesta lleva a lo más `CHANGES_MAX_ROWS` filas. Fuera de
+esos límites el cliente debe descargar el dataset completo.
+"""
+
+from typing import Dict, List, Optional, Type
+
+from sqlalchemy import false, func, inspect, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.core.settings import get_settings
+from src.models.dataset_version import DatasetChange, DatasetVersion
+from src.models.unequality_indicators import UnequalityIndicators
+from src.models.urban_quality import UrbanQuality
+
+CHANGE_FEEDS: Dict[str, Type] = {
+    "urban_quality": UrbanQuality,
+    "unequality_indicators": UnequalityIndicators,
+}
+
+# Columnas de las filas insertadas/actualizadas: todas menos los timestamps
+_EXCLUDED_COLUMNS = {"created_at", "updated_at"}
+
+
+def _feed_columns(model):
+    return [
+        getattr(model, attr.key).label(attr.key)
+        for attr in inspect(model).column_attrs
+        if attr.key not in _EXCLUDED_COLUMNS
+    ]
+
+
+def select_window():
+    """
+    Versión actual y la mínima desde la que hay cambios registrados (la
+    última versión anterior al registro de cambios, o 0).
+    """
+    return select(
+        func.coalesce(func.max(DatasetVersion.id), 0),
+        func.coalesce(
+            func.max(DatasetVersion.id).filter(DatasetVersion.changes_recorded == false()), 0
+        ),
+    )
+
+
+def select_changes(dataset: str, since: int, until: int, limit: Optional[int] = None):
+    """
+    SELECTs de las filas insertadas/actualizadas (con sus columnas) y de los
+    ids borrados en las versiones `since` < v <= `until`, cada uno con a lo
+    más `limit` filas.
+
+    Se toma el cambio neto de cada fila: una fila insertada y después
+    actualizada cuenta como insertada; una insertada y borrada en el rango no
+    aparece.
+    """
+    model = CHANGE_FEEDS[dataset]
+    net = (
+        select(
+            DatasetChange.row_id,
+            func.bool_or(DatasetChange.op == "I").label("inserted"),
+            array_agg(aggregate_order_by(DatasetChange.op, DatasetChange.id.desc()))[1].label("last_op"),
+        )
+        .where(
+            DatasetChange.table_name == model.__tablename__,
+            DatasetChange.version_id > since,
+            DatasetChange.version_id <= until,
+        )
+        .group_by(DatasetChange.row_id)
+        .subquery()
+    )
+    upserts = (
+        select(net.c.inserted, *_feed_columns(model))
+        .join_from(net, model, model.id == net.c.row_id)
+        .where(net.c.last_op != "D")
+    )
+    deletes = select(net.c.row_id).where(net.c.last_op == "D", ~net.c.inserted)
+    if limit is not None:
+        upserts, deletes = upserts.limit(limit), deletes.limit(limit)
+    return upserts, deletes
+
+
+def _change_set(dataset: str, since: int, version: int, upserts, deletes) -> Optional[dict]:
+    upserts, deleted = upserts.all(), [row[0] for row in deletes]
+    if len(upserts) + len(deleted) > get_settings().changes_max_rows:
+        return None
+    inserted: List[dict] = []
+    updated: List[dict] = []
+    for row in upserts:
+        values = dict(row._mapping)
+        (inserted if values.pop("inserted") else updated).append(values)
+    return {
+        "dataset": dataset,
+        "since": since,
+        "version": version,
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+    }
+
+
+def get_changes(db: Session, dataset: str, since: int) -> Optional[dict]:
+    """
+    Cambios netos de un dataset desde la versión `since` hasta la actual.
+
+    Args:
+        db: Sesión de base de datos
+        dataset: Llave de `CHANGE_FEEDS`
+        since: Versión que tiene el cliente (0 = desde el inicio del registro)
+
+    Returns:
+        `{dataset, since, version, inserted, updated, deleted}` con las filas
+        completas de `inserted` / `updated` y los ids de `deleted`; None si no
+        hay cambios registrados desde `since` (nunca se registraron o ya se
+        borraron), si es mayor que la versión actual (p. ej. de otra base) o si
+        son más de `CHANGES_MAX_ROWS` filas; en todos los casos el cliente debe
+        descargar todo
+    """
+    version, floor = db.execute(select_window()).one()
+    if not floor <= since <= version:
+        return None
+    upserts, deletes = select_changes(dataset, since, version, get_settings().changes_max_rows + 1)
+    return _change_set(dataset, since, version, db.execute(upserts), db.execute(deletes))
+
+
+async def get_changes_async(db: AsyncSession, dataset: str, since: int) -> Optional[dict]:
+    """Igual que `get_changes` sobre una `AsyncSession`."""
+    version, floor = (await db.execute(select_window())).one()
+    if not floor <= since <= version:
+        return None
+    upserts, deletes = select_changes(dataset, since, version, get_settings().changes_max_rows + 1)
+    return _change_set(
+        dataset, since, version, await db.execute(upserts), await db.execute(deletes)
+    )
@@ -1,16 +1,210 @@
-from typing import Dict, Any, Tuple, Optional
-import asyncpg
+from typing import Dict, Any, Tuple, Optional, Sequence, List
 from shapely.geometry import shape, mapping
 from shapely.ops import transform as shp_transform
 from shapely import wkt as shp_wkt
 import json
 
+from src.core.database import AsyncpgPool
+from src.services.inequality_index import InequalityIndex
+
 # Conversión simple grados↔metros (aprox) si necesitas buffers rápidos
 def meters_to_deg(lat: float, meters: float) -> Tuple[float, float]:
     deg_lat = meters / 111_320.0
     deg_lon = meters / (111_320.0 * max(0.1, abs(__import__("math").cos(__import__("math").radians(lat)))))
     return deg_lat, deg_lon
 
+
+# Columnas de urban_features para PopulationRequest
+POPULATION_COLUMNS = """
+          pobtot, pobmas, pobfem,
+          pob0_14, pob15_29, pob30_59, p_60,
+          p_cd_t, graproes, graproes_f, graproes_m,
+          vivtot, vivpar, tvipahab, vivnohab,
+          prom_ocup, pro_ocup_c, v3masocu, v3masocu_p,
+          vph_pidt, vph_pidt_p, vph_c_el, vph_c_el_p, vph_exsa, vph_exsa_p,
+          vph_dren, vph_dren_p,
+          recucall_c, rampas_c, pasopeat_c, banqueta_c, guarnici_c,
+          ciclovia_c, ciclocar_c, alumpub_c, letrero_c, telpub_c,
+          arboles_c, drenajep_c, transcol_c, acesoper_c, acesoaut_c,
+          puessemi_c, puesambu_c"""
+
+# Columnas de inequality_indicators para UnequalityIndicatorsRequest
+INEQUALITY_COLUMNS = """
+          cve_ent, cve_mun, cve_sun, cvegeo, sun, gmu, iisu_sun, iisu_cd,
+          pobtot as "POBTOT",
+          empleo as "Empleo",
+          e_basica as "E_basica",
+          e_media as "E_media",
+          e_superior as "E_superior",
+          salud_cama as "Salud_cama",
+          salud_cons as "Salud_cons",
+          abasto as "Abasto",
+          espacio_ab as "Espacio_ab",
+          cultura as "Cultura",
+          est_tpte as "Est_Tpte\""""
+
+
+# Consultas de una zona ($1 lon, $2 lat del centroide)
+POPULATION_SQL = f"""
+        WITH target AS (
+          SELECT geom
+          FROM census_blocks
+          WHERE ST_Contains(geom, ST_SetSRID(ST_Point($1, $2), 4326))
+          LIMIT 1
+        )
+        SELECT{POPULATION_COLUMNS}
+        FROM urban_features
+        WHERE ST_Intersects(geom, (SELECT geom FROM target))
+        LIMIT 1;"""
+
+INEQUALITY_SQL = f"""
+        SELECT{INEQUALITY_COLUMNS}
+        FROM inequality_indicators
+        WHERE ST_Contains(geom, ST_SetSRID(ST_Point($1, $2), 4326))
+        LIMIT 1;"""
+
+
+# Consultas por lote: los centroides llegan como arreglos ($1 lon[], $2 lat[])
+# y cada zona se resuelve con LATERAL; `zone_idx` (1..N) es su posición.
+_ZONES_FROM = """
+        FROM unnest($1::float8[], $2::float8[]) WITH ORDINALITY AS z(lon, lat, zone_idx)"""
+
+_POPULATION_LATERAL = f"""
+        LEFT JOIN LATERAL (
+          SELECT geom
+          FROM census_blocks
+          WHERE ST_Contains(geom, ST_SetSRID(ST_Point(z.lon, z.lat), 4326))
+          LIMIT 1
+        ) AS target ON true
+        LEFT JOIN LATERAL (
+          SELECT{POPULATION_COLUMNS}
+          FROM urban_features
+          WHERE ST_Intersects(geom, target.geom)
+          LIMIT 1
+        ) AS f ON true"""
+
+_INEQUALITY_LATERAL = f"""
+        LEFT JOIN LATERAL (
+          SELECT{INEQUALITY_COLUMNS}
+          FROM inequality_indicators
+          WHERE ST_Contains(geom, ST_SetSRID(ST_Point(z.lon, z.lat), 4326))
+          LIMIT 1
+        ) AS i ON true"""
+
+POPULATION_BATCH_SQL = f"SELECT z.zone_idx, f.*{_ZONES_FROM}{_POPULATION_LATERAL};"
+INEQUALITY_BATCH_SQL = f"SELECT z.zone_idx, i.*{_ZONES_FROM}{_INEQUALITY_LATERAL};"
+# Ambos payloads en una sola fila por zona. Los nombres no chocan: las
+# columnas de inequality_indicators salen con alias entre comillas ("POBTOT")
+# o no existen en urban_features (cve_*, sun, gmu, iisu_*).
+CONTEXT_BATCH_SQL = f"SELECT z.zone_idx, f.*, i.*{_ZONES_FROM}{_POPULATION_LATERAL}{_INEQUALITY_LATERAL};"
+
+# Sentencias preparadas por conexión del pool (ver `AsyncpgPool.register`)
+STATEMENTS = {
+    "context_population": POPULATION_SQL,
+    "context_inequality": INEQUALITY_SQL,
+    "context_population_batch": POPULATION_BATCH_SQL,
+    "context_inequality_batch": INEQUALITY_BATCH_SQL,
+    "context_batch": CONTEXT_BATCH_SQL,
+}
+
+
+def _centroid(geometry: Dict[str, Any]) -> Tuple[float, float]:
+    # (lat, lon) del centroide de la geometría GeoJSON
+    c = shape(geometry).centroid
+    return c.y, c.x
+
+
+def _population_payload(row, lat: float, lon: float) -> Dict[str, Any]:
+    # Fallbacks sencillos si faltan datos
+    def d(name, default):
+        return row[name] if row and row[name] is not None else default
+
+    return {
+        "pobtot": d("pobtot", 0),
+        "pobmas": d("pobmas", 0),
+        "pobfem": d("pobfem", 0),
+        "pob0_14": d("pob0_14", 0),
+        "pob15_29": d("pob15_29", 0),
+        "pob30_59": d("pob30_59", 0),
+        "p_60": d("p_60", 0),
+        "p_cd_t": d("p_cd_t", 0),
+        "graproes": d("graproes", 0.0),
+        "graproes_f": d("graproes_f", 0.0),
+        "graproes_m": d("graproes_m", 0.0),
+
+        "vivtot": d("vivtot", 0),
+        "vivpar": d("vivpar", 0),
+        "tvipahab": d("tvipahab", 0),
+        "vivnohab": d("vivnohab", 0),
+        "prom_ocup": d("prom_ocup", 0.0),
+        "pro_ocup_c": d("pro_ocup_c", 0.0),
+        "v3masocu": d("v3masocu", 0),
+        "v3masocu_p": d("v3masocu_p", 0.0),
+
+        "vph_pidt": d("vph_pidt", 0),
+        "vph_pidt_p": d("vph_pidt_p", 0.0),
+        "vph_c_el": d("vph_c_el", 0),
+        "vph_c_el_p": d("vph_c_el_p", 0.0),
+        "vph_exsa": d("vph_exsa", 0),
+        "vph_exsa_p": d("vph_exsa_p", 0.0),
+        "vph_dren": d("vph_dren", 0),
+        "vph_dren_p": d("vph_dren_p", 0.0),
+
+        "recucall_c": d("recucall_c", "paved"),
+        "rampas_c": d("rampas_c", False),
+        "pasopeat_c": d("pasopeat_c", False),
+        "banqueta_c": d("banqueta_c", False),
+        "guarnici_c": d("guarnici_c", False),
+        "ciclovia_c": d("ciclovia_c", False),
+        "ciclocar_c": d("ciclocar_c", False),
+        "alumpub_c": d("alumpub_c", False),
+        "letrero_c": d("letrero_c", False),
+        "telpub_c": d("telpub_c", False),
+        "arboles_c": d("arboles_c", False),
+        "drenajep_c": d("drenajep_c", False),
+        "transcol_c": d("transcol_c", False),
+        "acesoper_c": d("acesoper_c", False),
+        "acesoaut_c": d("acesoaut_c", False),
+        "puessemi_c": d("puessemi_c", False),
+        "puesambu_c": d("puesambu_c", False),
+
+        "lat": float(lat),
+        "lon": float(lon),
+    }
+
+
+def _inequality_payload(row, wkt_str: str, lat: float, lon: float) -> Dict[str, Any]:
+    def d(name, default):
+        return row[name] if row and row[name] is not None else default
+
+    return {
+        "cve_ent": d("cve_ent", 0),
+        "cve_mun": d("cve_mun", 0),
+        "cve_sun": d("cve_sun", ""),
+        "cvegeo": d("cvegeo", ""),
+        "sun": d("sun", ""),
+        "gmu": d("gmu", ""),
+        "iisu_sun": d("iisu_sun", ""),
+        "iisu_cd": d("iisu_cd", ""),
+
+        "POBTOT": d("POBTOT", 0),
+        "Empleo": d("Empleo", 0),
+        "E_basica": d("E_basica", 0),
+        "E_media": d("E_media", 0),
+        "E_superior": d("E_superior", 0),
+        "Salud_cama": d("Salud_cama", 0),
+        "Salud_cons": d("Salud_cons", 0),
+        "Abasto": d("Abasto", 0),
+        "Espacio_ab": d("Espacio_ab", 0),
+        "Cultura": d("Cultura", 0),
+        "Est_Tpte": d("Est_Tpte", 0),
+
+        "geometry_wkt": wkt_str,
+        "lat": float(lat),
+        "lon": float(lon),
+    }
+
+
 class ContextBuilder:
     """
     Arma los payloads para:
@@ -18,13 +212,24 @@ class ContextBuilder:
       - UnequalityIndicatorsRequest (tool Population Inequality Model)
     a partir de una geometry (GeoJSON) o lat/lon.
     Hace el query inicial a tu base (ej. Postgres con PostGIS).
-    """
 
-    def __init__(self, dsn: str):
-        self.dsn = dsn
+    Las variantes `build_*_payloads` resuelven todas las zonas de un plan en
+    una sola sentencia (centroides como arreglos + `LATERAL`) en lugar de
+    una consulta por zona, y `build_context_payload(s)` trae los dos payloads
+    en el mismo viaje a la base.
+
+    Con un `InequalityIndex` el payload de desigualdad se resuelve en memoria
+    (STRtree sobre los polígonos de `unequality_indicators`) en lugar de con
+    `inequality_indicators` en la base.
+    """
 
-    async def _conn(self):
-        return await asyncpg.connect(self.dsn)
+    def __init__(self, pool: AsyncpgPool, inequality_index: Optional[InequalityIndex] = None):
+        # Pool compartido de la app (`src.core.database.asyncpg_pool`): cada
+        # consulta toma una conexión abierta en lugar de conectarse de nuevo
+        self.pool = pool
+        for name, sql in STATEMENTS.items():
+            pool.register(name, sql)
+        self.inequality_index = inequality_index
 
     async def build_population_payload(
         self, geometry: Dict[str, Any], lat: float, lon: float
@@ -34,94 +239,10 @@ class ContextBuilder:
         Aquí se muestran consultas ejemplo; ajusta nombres de tablas/campos.
         """
         # Ejemplo: usa centroid para asociar zona censal
-        g = shape(geometry)
-        c = g.centroid
-        lat_c, lon_c = c.y, c.x
+        lat_c, lon_c = _centroid(geometry)
 
-        sql = """
-        WITH target AS (
-          SELECT geom
-          FROM census_blocks
-          WHERE ST_Contains(geom, ST_SetSRID(ST_Point($1, $2), 4326))
-          LIMIT 1
-        )
-        SELECT
-          pobtot, pobmas, pobfem,
-          pob0_14, pob15_29, pob30_59, p_60,
-          p_cd_t, graproes, graproes_f, graproes_m,
-          vivtot, vivpar, tvipahab, vivnohab,
-          prom_ocup, pro_ocup_c, v3masocu, v3masocu_p,
-          vph_pidt, vph_pidt_p, vph_c_el, vph_c_el_p, vph_exsa, vph_exsa_p,
-          vph_dren, vph_dren_p,
-          recucall_c, rampas_c, pasopeat_c, banqueta_c, guarnici_c,
-          ciclovia_c, ciclocar_c, alumpub_c, letrero_c, telpub_c,
-          arboles_c, drenajep_c, transcol_c, acesoper_c, acesoaut_c,
-          puessemi_c, puesambu_c
-        FROM urban_features
-        WHERE ST_Intersects(geom, (SELECT geom FROM target))
-        LIMIT 1;
-        """
-
-        async with await self._conn() as con:
-            row = await con.fetchrow(sql, lon_c, lat_c)
-
-        # Fallbacks sencillos si faltan datos
-        def d(name, default):
-            return row[name] if row and row[name] is not None else default
-
-        payload = {
-            "pobtot": d("pobtot", 0),
-            "pobmas": d("pobmas", 0),
-            "pobfem": d("pobfem", 0),
-            "pob0_14": d("pob0_14", 0),
-            "pob15_29": d("pob15_29", 0),
-            "pob30_59": d("pob30_59", 0),
-            "p_60": d("p_60", 0),
-            "p_cd_t": d("p_cd_t", 0),
-            "graproes": d("graproes", 0.0),
-            "graproes_f": d("graproes_f", 0.0),
-            "graproes_m": d("graproes_m", 0.0),
-
-            "vivtot": d("vivtot", 0),
-            "vivpar": d("vivpar", 0),
-            "tvipahab": d("tvipahab", 0),
-            "vivnohab": d("vivnohab", 0),
-            "prom_ocup": d("prom_ocup", 0.0),
-            "pro_ocup_c": d("pro_ocup_c", 0.0),
-            "v3masocu": d("v3masocu", 0),
-            "v3masocu_p": d("v3masocu_p", 0.0),
-
-            "vph_pidt": d("vph_pidt", 0),
-            "vph_pidt_p": d("vph_pidt_p", 0.0),
-            "vph_c_el": d("vph_c_el", 0),
-            "vph_c_el_p": d("vph_c_el_p", 0.0),
-            "vph_exsa": d("vph_exsa", 0),
-            "vph_exsa_p": d("vph_exsa_p", 0.0),
-            "vph_dren": d("vph_dren", 0),
-            "vph_dren_p": d("vph_dren_p", 0.0),
-
-            "recucall_c": d("recucall_c", "paved"),
-            "rampas_c": d("rampas_c", False),
-            "pasopeat_c": d("pasopeat_c", False),
-            "banqueta_c": d("banqueta_c", False),
-            "guarnici_c": d("guarnici_c", False),
-            "ciclovia_c": d("ciclovia_c", False),
-            "ciclocar_c": d("ciclocar_c", False),
-            "alumpub_c": d("alumpub_c", False),
-            "letrero_c": d("letrero_c", False),
-            "telpub_c": d("telpub_c", False),
-            "arboles_c": d("arboles_c", False),
-            "drenajep_c": d("drenajep_c", False),
-            "transcol_c": d("transcol_c", False),
-            "acesoper_c": d("acesoper_c", False),
-            "acesoaut_c": d("acesoaut_c", False),
-            "puessemi_c": d("puessemi_c", False),
-            "puesambu_c": d("puesambu_c", False),
-
-            "lat": float(lat),
-            "lon": float(lon),
-        }
-        return payload
+        row = await self._fetch_one("context_population", lon_c, lat_c)
+        return _population_payload(row, lat, lon)
 
     async def build_inequality_payload(
         self, geometry: Dict[str, Any], lat: float, lon: float
@@ -130,60 +251,108 @@ class ContextBuilder:
         Devuelve dict con TODOS los campos exigidos por UnequalityIndicatorsRequest.
         Incluye wkt y códigos de entidad/municipio consultados por punto.
         """
-        g = shape(geometry)
-        c = g.centroid
-        lat_c, lon_c = c.y, c.x
-        wkt_str = g.wkt  # geometry_wkt
+        lat_c, lon_c = _centroid(geometry)
+        wkt_str = shape(geometry).wkt  # geometry_wkt
 
-        sql = """
-        SELECT
-          cve_ent, cve_mun, cve_sun, cvegeo, sun, gmu, iisu_sun, iisu_cd,
-          pobtot as "POBTOT",
-          empleo as "Empleo",
-          e_basica as "E_basica",
-          e_media as "E_media",
-          e_superior as "E_superior",
-          salud_cama as "Salud_cama",
-          salud_cons as "Salud_cons",
-          abasto as "Abasto",
-          espacio_ab as "Espacio_ab",
-          cultura as "Cultura",
-          est_tpte as "Est_Tpte"
-        FROM inequality_indicators
-        WHERE ST_Contains(geom, ST_SetSRID(ST_Point($1, $2), 4326))
-        LIMIT 1;
+        if self.inequality_index is not None:
+            (row,) = self.inequality_index.rows_at([lat_c], [lon_c])
+        else:
+            row = await self._fetch_one("context_inequality", lon_c, lat_c)
+        return _inequality_payload(row, wkt_str, lat, lon)
+
+    async def _fetch_one(self, statement: str, *args) -> Optional[Any]:
+        async with self.pool.acquire() as con:
+            records = await self.pool.fetch(con, statement, *args)
+        return records[0] if records else None
+
+    def _locate_inequality(self, zones: Sequence[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        # Fila de inequality de cada zona desde el índice en memoria
+        centroids = [_centroid(z["geometry"]) for z in zones]
+        return self.inequality_index.rows_at(
+            [lat_c for lat_c, _ in centroids], [lon_c for _, lon_c in centroids]
+        )
+
+    async def _fetch_by_centroid(self, statement: str, zones: Sequence[Dict[str, Any]]) -> List[Optional[Any]]:
+        # Ejecuta la sentencia `statement` con los centroides de todas las
+        # zonas ($1 lon[], $2 lat[]) y regresa la fila de cada zona en el mismo orden (None si no hubo match)
+        centroids = [_centroid(z["geometry"]) for z in zones]
+        lons = [lon_c for _, lon_c in centroids]
+        lats = [lat_c for lat_c, _ in centroids]
+
+        async with self.pool.acquire() as con:
+            records = await self.pool.fetch(con, statement, lons, lats)
+
+        rows: List[Optional[Any]] = [None] * len(zones)
+        for record in records:
+            rows[record["zone_idx"] - 1] = record
+        return rows
+
+    async def build_population_payloads(
+        self, zones: Sequence[Dict[str, Any]]
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Igual que `build_population_payload` para varias zonas
+        (`{"id", "lat", "lon", "geometry"}`) en una sola consulta.
+        Regresa los payloads por id de zona.
+        """
+        if not zones:
+            return {}
+
+        rows = await self._fetch_by_centroid("context_population_batch", zones)
+        return {
+            z["id"]: _population_payload(row, float(z["lat"]), float(z["lon"]))
+            for z, row in zip(zones, rows)
+        }
+
+    async def build_inequality_payloads(
+        self, zones: Sequence[Dict[str, Any]]
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Igual que `build_inequality_payload` para varias zonas en una sola
+        consulta. Regresa los payloads por id de zona.
+        """
+        if not zones:
+            return {}
+
+        if self.inequality_index is not None:
+            rows = self._locate_inequality(zones)
+        else:
+            rows = await self._fetch_by_centroid("context_inequality_batch", zones)
+        return {
+            z["id"]: _inequality_payload(row, shape(z["geometry"]).wkt, float(z["lat"]), float(z["lon"]))
+            for z, row in zip(zones, rows)
+        }
+
+    async def build_context_payload(
+        self, geometry: Dict[str, Any], lat: float, lon: float
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        `(population, inequality)` de una zona en una sola consulta: ambos
+        payloads comparten el centroide, así que no hace falta un viaje por cada uno.
+        """
+        payloads = await self.build_context_payloads([{"id": None, "lat": lat, "lon": lon, "geometry": geometry}])
+        return payloads[None]
+
+    async def build_context_payloads(
+        self, zones: Sequence[Dict[str, Any]]
+    ) -> Dict[Any, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        `build_context_payload` para varias zonas en una sola consulta.
+        Regresa `(population, inequality)` por id de zona.
         """
+        if not zones:
+            return {}
 
-        async with await self._conn() as con:
-            row = await con.fetchrow(sql, lon_c, lat_c)
-
-        def d(name, default):
-            return row[name] if row and row[name] is not None else default
-
-        payload = {
-            "cve_ent": d("cve_ent", 0),
-            "cve_mun": d("cve_mun", 0),
-            "cve_sun": d("cve_sun", ""),
-            "cvegeo": d("cvegeo", ""),
-            "sun": d("sun", ""),
-            "gmu": d("gmu", ""),
-            "iisu_sun": d("iisu_sun", ""),
-            "iisu_cd": d("iisu_cd", ""),
-
-            "POBTOT": d("POBTOT", 0),
-            "Empleo": d("Empleo", 0),
-            "E_basica": d("E_basica", 0),
-            "E_media": d("E_media", 0),
-            "E_superior": d("E_superior", 0),
-            "Salud_cama": d("Salud_cama", 0),
-            "Salud_cons": d("Salud_cons", 0),
-            "Abasto": d("Abasto", 0),
-            "Espacio_ab": d("Espacio_ab", 0),
-            "Cultura": d("Cultura", 0),
-            "Est_Tpte": d("Est_Tpte", 0),
-
-            "geometry_wkt": wkt_str,
-            "lat": float(lat),
-            "lon": float(lon),
+        if self.inequality_index is not None:
+            # Solo population va a la base; inequality sale del índice
+            pop_rows = await self._fetch_by_centroid("context_population_batch", zones)
+            ineq_rows = self._locate_inequality(zones)
+        else:
+            pop_rows = ineq_rows = await self._fetch_by_centroid("context_batch", zones)
+        return {
+            z["id"]: (
+                _population_payload(pop_row, float(z["lat"]), float(z["lon"])),
+                _inequality_payload(ineq_row, shape(z["geometry"]).wkt, float(z["lat"]), float(z["lon"])),
+            )
+            for z, pop_row, ineq_row in zip(zones, pop_rows, ineq_rows)
         }
-        return payload
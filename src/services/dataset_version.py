@@ -0,0 +1,113 @@
+"""
+Versión del dataset de Urban Quality.
+
+Cada carga con `scripts/loadto_db.py` agrega una fila a `dataset_versions`
+(`bump_dataset_version`); la de id más alto es la versión vigente. Las cachés
+de /api/v1 (tiles, bbox, snapshot) y los ETag usan esta versión, así que una
+carga nueva invalida lo anterior aunque ocurra en otro proceso.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from src.core.database import engine
+from src.core.settings import get_settings
+from src.models.dataset_version import DatasetChange, DatasetVersion
+
+
+class VersionInfo(NamedTuple):
+    version: str
+    created_at: Optional[datetime]
+
+
+# Sin cargas registradas (tabla vacía)
+EMPTY_VERSION = VersionInfo("0", None)
+
+_lock = threading.Lock()
+_cached: Optional[VersionInfo] = None
+_checked_at = 0.0
+
+
+def compute_dataset_version(db: Session) -> VersionInfo:
+    """
+    Lee la última versión registrada en `dataset_versions`. Siempre del
+    primario, aunque `db` lea de réplicas: la versión se memoriza para todo el
+    proceso (cachés y ETag) y una réplica atrasada la dejaría vieja hasta el TTL.
+    """
+    row = db.execute(
+        select(DatasetVersion.id, DatasetVersion.created_at)
+        .order_by(DatasetVersion.id.desc())
+        .limit(1),
+        bind_arguments={"bind": engine},
+    ).first()
+    if row is None:
+        return EMPTY_VERSION
+    return VersionInfo(str(row.id), row.created_at)
+
+
+def cached_version_info() -> Optional[VersionInfo]:
+    """Versión memorizada si sigue vigente (sin ir a la base), o None."""
+    with _lock:
+        if _cached is not None and time.monotonic() - _checked_at < get_settings().dataset_version_ttl:
+            return _cached
+    return None
+
+
+def get_version_info(db: Session) -> VersionInfo:
+    """
+    Versión actual del dataset y fecha de la carga. Se consulta como máximo
+    una vez cada `DATASET_VERSION_TTL` segundos por proceso.
+    """
+    global _cached, _checked_at
+
+    info = cached_version_info()
+    if info is not None:
+        return info
+
+    info = compute_dataset_version(db)
+    with _lock:
+        _cached = info
+        _checked_at = time.monotonic()
+    return info
+
+
+def get_dataset_version(db: Session) -> str:
+    return get_version_info(db).version
+
+
+def bump_dataset_version(db: Session, datasets: str) -> str:
+    """
+    Registra una carga nueva y regresa su versión. Los cambios de filas
+    pendientes (los que registraron los triggers desde la versión anterior)
+    quedan asignados a ella en la misma transacción.
+
+    Solo se conservan los cambios de las últimas `CHANGES_HISTORY_VERSIONS`
+    versiones: las anteriores se marcan sin registro de cambios y
+    /api/v1/changes responde 410 para ellas.
+    """
+    global _cached
+
+    record = DatasetVersion(datasets=datasets)
+    db.add(record)
+    db.flush()
+    db.execute(
+        update(DatasetChange)
+        .where(DatasetChange.version_id.is_(None))
+        .values(version_id=record.id)
+    )
+    cutoff = record.id - get_settings().changes_history_versions
+    db.execute(
+        update(DatasetVersion)
+        .where(DatasetVersion.id <= cutoff, DatasetVersion.changes_recorded)
+        .values(changes_recorded=False)
+    )
+    db.execute(delete(DatasetChange).where(DatasetChange.version_id <= cutoff))
+    db.commit()
+    with _lock:
+        _cached = None
+    return str(record.id)
@@ -0,0 +1,132 @@
+"""
+Índice espacial en memoria de `unequality_indicators`.
+
+Los polígonos de cada AGEB vienen como WKT en la columna `geometry`, así que
+con `INEQUALITY_INDEX_ENABLED=true` se parsean una sola vez a geometrías de
+shapely y se indexan en un `STRtree`. "¿Qué AGEB contiene este punto?" se
+responde para miles de centroides en una sola llamada vectorizada, sin
+PostGIS ni volver a parsear WKT (ver `ContextBuilder`).
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import shapely
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.settings import get_settings
+from src.models.unequality_indicators import UnequalityIndicators
+from src.services.dataset_version import get_dataset_version
+
+# Atributos que se guardan por AGEB: los del payload de UnequalityIndicatorsRequest
+INDEX_COLUMNS = (
+    "cve_ent", "cve_mun", "cve_sun", "cvegeo", "sun", "gmu", "iisu_sun", "iisu_cd",
+    "POBTOT", "Empleo", "E_basica", "E_media", "E_superior", "Salud_cama",
+    "Salud_cons", "Abasto", "Espacio_ab", "Cultura", "Est_Tpte",
+)
+
+
+class InequalityIndex:
+    """
+    Polígonos de `unequality_indicators` en un `STRtree`, con los atributos
+    de cada AGEB en el mismo orden que el árbol.
+
+    Las filas sin WKT o con WKT inválido se descartan al construirlo.
+    """
+
+    def __init__(self, rows: Sequence[Dict], wkts: Sequence[Optional[str]], version: str):
+        geometries = shapely.from_wkt(np.array(wkts, dtype=object), on_invalid="ignore")
+        valid = np.flatnonzero(~shapely.is_missing(geometries) & ~shapely.is_empty(geometries))
+        self.geometries = geometries[valid]
+        self.rows = [rows[i] for i in valid.tolist()]
+        self.tree = shapely.STRtree(self.geometries)
+        self.version = version
+        self.size = len(self.rows)
+        self.skipped = len(rows) - self.size
+
+    @classmethod
+    def from_rows(cls, rows, version: str) -> "InequalityIndex":
+        """Construye el índice a partir de tuplas `(*INDEX_COLUMNS, wkt)`."""
+        rows = list(rows)
+        attributes = [dict(zip(INDEX_COLUMNS, row)) for row in rows]
+        return cls(attributes, [row[len(INDEX_COLUMNS)] for row in rows], version)
+
+    @classmethod
+    def load(cls, db: Session) -> "InequalityIndex":
+        """Lee los polígonos y atributos de `unequality_indicators` desde la base."""
+        version = get_dataset_version(db)
+        stmt = select(
+            *(getattr(UnequalityIndicators, name) for name in INDEX_COLUMNS),
+            UnequalityIndicators.geometry_wkt,
+        ).where(UnequalityIndicators.geometry_wkt.is_not(None))
+        return cls.from_rows(db.execute(stmt).all(), version)
+
+    def locate(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """
+        Posición (en `rows`) del polígono que contiene cada punto, -1 si ninguno.
+
+        Igual que `ST_Contains`, un punto en el borde no cuenta como contenido;
+        si varios polígonos contienen el punto se toma el primero del índice.
+        """
+        points = shapely.points(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        result = np.full(len(points), -1, dtype=np.int64)
+        if not self.size or not len(points):
+            return result
+
+        point_idx, tree_idx = self.tree.query(points, predicate="within")
+        # Menor índice del árbol por punto: se ordena por (punto, polígono) y
+        # se queda el primer par de cada punto
+        order = np.lexsort((tree_idx, point_idx))
+        point_idx, tree_idx = point_idx[order], tree_idx[order]
+        _, first = np.unique(point_idx, return_index=True)
+        result[point_idx[first]] = tree_idx[first]
+        return result
+
+    def rows_at(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[Dict]]:
+        """Atributos del AGEB que contiene cada punto (None si ninguno)."""
+        return [self.rows[i] if i >= 0 else None for i in self.locate(lats, lons).tolist()]
+
+    def cvegeo_at(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[str]]:
+        """`cvegeo` del AGEB que contiene cada punto (None si ninguno)."""
+        return [row["cvegeo"] if row else None for row in self.rows_at(lats, lons)]
+
+
+_lock = threading.Lock()
+_index: Optional[InequalityIndex] = None
+
+
+def inequality_index_enabled() -> bool:
+    return get_settings().inequality_index_enabled
+
+
+def load_inequality_index(db: Session) -> InequalityIndex:
+    """Carga (o recarga) el índice del proceso."""
+    global _index
+    with _lock:
+        _index = InequalityIndex.load(db)
+        return _index
+
+
+def get_inequality_index(db: Session) -> InequalityIndex:
+    """
+    Índice vigente. Si la versión del dataset cambió (nueva carga del ETL)
+    se reconstruye antes de responder.
+    """
+    global _index
+    version = get_dataset_version(db)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = InequalityIndex.load(db)
+        return _index
+
+
+def inequality_index_stats() -> Optional[dict]:
+    index = _index
+    if index is None:
+        return None
+    return {"version": index.version, "polygons": index.size, "skipped": index.skipped}
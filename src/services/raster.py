@@ -0,0 +1,144 @@
+"""
+Rasters de densidad (heatmaps) de Urban Quality.
+
+Los puntos del bbox se agrupan en una grilla de `width` × `height` celdas con
+`numpy.histogram2d`, ponderados por la métrica, y se entregan como PNG (con
+una rampa de color) o como `.npy` con los valores crudos. Una imagen de
+256×256 pesa mucho menos que todos los puntos del área. Los rasters se
+guardan en una caché LRU en memoria cuya llave incluye la versión del
+dataset, igual que los vector tiles.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.settings import get_settings
+from src.models.urban_quality import UrbanQuality
+from src.services import snapshot
+from src.services.dataset_version import get_dataset_version
+from src.services.service import bbox_filter
+from src.utils import raster
+
+# Columna que pondera cada punto y si la celda suma o promedia, igual que
+# los agregados de /{metric}/grid
+RASTER_WEIGHTS = {
+    "population": ("POBTOT", "sum"),
+    "education": ("GRAPROES", "mean"),
+    "trees": ("ARBOLES_C", "sum"),
+}
+RASTER_FORMATS = {"png": raster.PNG_MEDIA_TYPE, "npy": raster.NPY_MEDIA_TYPE}
+
+DEFAULT_RASTER_SIZE = 256
+MAX_RASTER_SIZE = 2048
+
+RasterKey = Tuple[str, str, Tuple[float, float, float, float], int, int, str]
+
+_lock = threading.Lock()
+_memory_cache: Optional[LRUCache] = None
+
+
+def _cache() -> LRUCache:
+    global _memory_cache
+    if _memory_cache is None:
+        _memory_cache = LRUCache(maxsize=get_settings().raster_cache_size)
+    return _memory_cache
+
+
+def _points(
+    db: Session, column: str, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # lat, lon y peso (NaN si es nulo) de los puntos del bbox
+    if snapshot.snapshot_enabled():
+        current = snapshot.get_snapshot(db)
+        index = current.mask(lat_min, lat_max, lon_min, lon_max)
+        return tuple(
+            current.columns[name][index].astype(np.float64) for name in ("lat", "lon", column)
+        )
+
+    stmt = select(UrbanQuality.lat, UrbanQuality.lon, getattr(UrbanQuality, column)).where(
+        bbox_filter(lat_min, lat_max, lon_min, lon_max)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return np.empty(0), np.empty(0), np.empty(0)
+    lat, lon, weight = np.array(rows, dtype=np.float64).T
+    return lat, lon, weight
+
+
+def compute_raster(
+    db: Session,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    width: int,
+    height: int,
+) -> np.ndarray:
+    """
+    Grilla (`height` × `width`, float64) de la métrica en el bbox.
+
+    La fila 0 es el borde norte (orientación de imagen). Con agregado "sum"
+    las celdas sin puntos valen 0; con "mean" valen NaN. Los puntos con la
+    métrica nula se ignoran.
+    """
+    column, aggregate = RASTER_WEIGHTS[metric]
+    lat, lon, weight = _points(db, column, lat_min, lat_max, lon_min, lon_max)
+    valid = ~np.isnan(weight)
+    lat, lon, weight = lat[valid], lon[valid], weight[valid]
+
+    bins = (height, width)
+    extent = ((lat_min, lat_max), (lon_min, lon_max))
+    grid, _, _ = np.histogram2d(lat, lon, bins=bins, range=extent, weights=weight)
+    if aggregate == "mean":
+        counts, _, _ = np.histogram2d(lat, lon, bins=bins, range=extent)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grid = np.where(counts > 0, grid / counts, np.nan)
+    return np.flipud(grid)
+
+
+def get_raster(
+    db: Session,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    width: int = DEFAULT_RASTER_SIZE,
+    height: int = DEFAULT_RASTER_SIZE,
+    fmt: str = "png",
+) -> bytes:
+    """
+    Regresa el raster desde la caché o lo genera y lo guarda.
+
+    Args:
+        db: Sesión de base de datos
+        metric: Llave de `RASTER_WEIGHTS` ("population", "education" o "trees")
+        lat_min / lat_max / lon_min / lon_max: Bbox que cubre el raster
+        width: Columnas de la grilla (píxeles de ancho)
+        height: Filas de la grilla (píxeles de alto)
+        fmt: Llave de `RASTER_FORMATS` ("png" o "npy")
+
+    Returns:
+        Raster codificado en el formato pedido
+    """
+    lat_min, lat_max = sorted((lat_min, lat_max))
+    lon_min, lon_max = sorted((lon_min, lon_max))
+    key: RasterKey = (
+        get_dataset_version(db), metric, (lat_min, lat_max, lon_min, lon_max), width, height, fmt
+    )
+    with _lock:
+        content = _cache().get(key)
+    if content is not None:
+        return content
+
+    grid = compute_raster(db, metric, lat_min, lat_max, lon_min, lon_max, width, height)
+    content = raster.encode_png(raster.colorize(grid)) if fmt == "png" else raster.encode_npy(grid)
+    with _lock:
+        _cache()[key] = content
+    return content
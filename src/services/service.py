@@ -3,9 +3,299 @@ Servicios para consultas a la base de datos de Urban Quality.
 Contiene la lógica de negocio para filtrar datos por área geográfica.
 """
 
+import math
+import threading
+import uuid
+import numpy as np
+import shapely
+import shapely.validation
+from shapely.geometry import shape
+from cachetools import TTLCache
+from sqlalchemy import Float, Integer, Row, column, func, select, true, tuple_, values
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from starlette.concurrency import run_in_threadpool
+from src.core.database import ReadSessionLocal
+from src.core.settings import get_settings
 from src.models.urban_quality import UrbanQuality
+from src.services.dataset_version import get_dataset_version
+from src.services import snapshot
+from src.utils.helpers import METERS_PER_DEGREE, haversine_m
+
+
+# Columnas que devuelve cada endpoint. Las consultas seleccionan solo estas
+# columnas y regresan filas `Row` (tuplas con acceso por nombre) en lugar de
+# hidratar entidades ORM completas con UUID y timestamps.
+POPULATION_COLUMNS = (UrbanQuality.lat, UrbanQuality.lon, UrbanQuality.POBTOT)
+EDUCATION_COLUMNS = (
+    UrbanQuality.lat,
+    UrbanQuality.lon,
+    UrbanQuality.GRAPROES,
+    UrbanQuality.GRAPROES_F,
+    UrbanQuality.GRAPROES_M,
+)
+TREES_COLUMNS = (UrbanQuality.lat, UrbanQuality.lon, UrbanQuality.ARBOLES_C)
+
+METRIC_COLUMNS = {
+    "population": POPULATION_COLUMNS,
+    "education": EDUCATION_COLUMNS,
+    "trees": TREES_COLUMNS,
+}
+
+# Nombres de los campos de cada endpoint, en el mismo orden que las columnas
+METRIC_FIELDS = {
+    metric: tuple(column.key for column in columns)
+    for metric, columns in METRIC_COLUMNS.items()
+}
+
+# Tipo de Python de cada campo (int/float), para formatos tipados como Arrow
+METRIC_TYPES = {
+    metric: {column.key: column.type.python_type for column in columns}
+    for metric, columns in METRIC_COLUMNS.items()
+}
+
+# Agregados por celda para /{metric}/grid: suma de población y árboles,
+# promedio de escolaridad
+GRID_AGGREGATES = {
+    "population": (func.sum(UrbanQuality.POBTOT).label("POBTOT"),),
+    "education": (
+        func.avg(UrbanQuality.GRAPROES).label("GRAPROES"),
+        func.avg(UrbanQuality.GRAPROES_F).label("GRAPROES_F"),
+        func.avg(UrbanQuality.GRAPROES_M).label("GRAPROES_M"),
+    ),
+    "trees": (func.sum(UrbanQuality.ARBOLES_C).label("ARBOLES_C"),),
+}
+MAX_GRID_CELLS = 250_000
+
+# Filas por bloque al leer con cursor del lado del servidor
+STREAM_CHUNK_SIZE = 5000
+
+# Paginación keyset: orden estable sobre el índice ix_urban_quality_lat_lon_id
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+PAGE_KEY = (UrbanQuality.lat, UrbanQuality.lon, UrbanQuality.id)
+
+# /nearest: todas las columnas de las métricas más la distancia en metros
+NEAREST_COLUMNS = tuple(getattr(UrbanQuality, name) for name in snapshot.SNAPSHOT_COLUMNS)
+NEAREST_FIELDS = tuple(column.key for column in NEAREST_COLUMNS) + ("distance_m",)
+NEAREST_TYPES = {
+    **{column.key: column.type.python_type for column in NEAREST_COLUMNS},
+    "distance_m": float,
+}
+MAX_NEAREST = 1000
+# El índice ordena por distancia en grados (plana); se piden más candidatos y
+# se reordenan por distancia real, porque un grado de longitud mide menos que
+# uno de latitud (~0.9 en Monterrey). Si no alcanzan (ver `_nearest_complete`)
+# se vuelve a pedir con un límite `NEAREST_CANDIDATES_FACTOR` veces mayor.
+NEAREST_CANDIDATES_FACTOR = 4
+
+
+def bbox_filter(lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+    """
+    Condición `point(lon, lat) <@ box(...)` para filtrar por bounding box.
+
+    Usa la misma expresión que el índice GiST `ix_urban_quality_point`, de modo
+    que Postgres resuelve el rectángulo con el índice en lugar de un scan
+    secuencial. Igual que `between`, los bordes del rectángulo son inclusivos.
+    """
+    return func.point(UrbanQuality.lon, UrbanQuality.lat).op("<@")(
+        func.box(func.point(lon_min, lat_min), func.point(lon_max, lat_max))
+    )
+
+
+def select_by_area(
+    columns,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float
+):
+    """
+    Construye el SELECT proyectado de `columns` dentro del bounding box.
+    """
+    return select(*columns).where(bbox_filter(lat_min, lat_max, lon_min, lon_max))
+
+
+class BBoxCache:
+    """
+    Caché read-through de consultas por bounding box.
+
+    El bbox pedido se cubre con celdas de `cell_size` grados alineadas a una
+    malla fija; cada celda se guarda por separado con llave
+    (versión del dataset, métrica, fila, columna). Dos bboxes que se traslapan
+    comparten las celdas en común y solo las faltantes van a la base, en una
+    sola consulta. El tamaño se mide en filas (`max_rows`) con desalojo LRU, y
+    cada celda expira a los `ttl` segundos. Como la llave incluye la versión
+    del dataset, una carga nueva de `loadto_db` deja de usar las celdas viejas.
+    """
+
+    def __init__(self, cell_size: float, max_rows: int, ttl: float, max_cells: int = 400):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._cells = TTLCache(maxsize=max_rows, ttl=ttl, getsizeof=lambda rows: len(rows) + 1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def get_rows(
+        self,
+        db: Session,
+        metric: str,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float
+    ) -> List[Row]:
+        """Filas de `metric` dentro del bbox, resueltas desde las celdas."""
+        lat_min, lat_max = sorted((lat_min, lat_max))
+        lon_min, lon_max = sorted((lon_min, lon_max))
+        rows_range = range(self._cell(lat_min), self._cell(lat_max) + 1)
+        cols_range = range(self._cell(lon_min), self._cell(lon_max) + 1)
+
+        # Áreas muy grandes no se cachean: llenarían la caché de una sola vez
+        if len(rows_range) * len(cols_range) > self.max_cells:
+            with self._lock:
+                self.bypassed += 1
+            return self._query(db, metric, lat_min, lat_max, lon_min, lon_max)
+
+        version = get_dataset_version(db)
+        cells: Dict[Tuple[int, int], List[Row]] = {}
+        missing = []
+        with self._lock:
+            for i in rows_range:
+                for j in cols_range:
+                    cached = self._cells.get((version, metric, i, j))
+                    if cached is None:
+                        missing.append((i, j))
+                    else:
+                        cells[(i, j)] = cached
+            self.hits += len(cells)
+            self.misses += len(missing)
+
+        if missing:
+            cells.update(self._fetch_cells(db, version, metric, missing))
+
+        # Las celdas interiores (por índice, no por bordes en flotante) caen
+        # completas en el bbox: `_cell` es monótona, así que una fila de la
+        # celda i con i > _cell(lat_min) cumple lat >= lat_min, etc.
+        results: List[Row] = []
+        for (i, j), cell_rows in cells.items():
+            inside = (
+                rows_range.start < i < rows_range.stop - 1
+                and cols_range.start < j < cols_range.stop - 1
+            )
+            if inside:
+                results.extend(cell_rows)
+            else:
+                results.extend(
+                    row for row in cell_rows
+                    if lat_min <= row.lat <= lat_max and lon_min <= row.lon <= lon_max
+                )
+        return results
+
+    def _query(
+        self, db: Session, metric: str, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+    ) -> List[Row]:
+        stmt = select_by_area(METRIC_COLUMNS[metric], lat_min, lat_max, lon_min, lon_max)
+        return db.execute(stmt).all()
+
+    def _fetch_cells(
+        self, db: Session, version: str, metric: str, missing: List[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], List[Row]]:
+        """Consulta de una vez el rectángulo que cubre las celdas faltantes."""
+        size = self.cell_size
+        i_min = min(i for i, _ in missing)
+        i_max = max(i for i, _ in missing)
+        j_min = min(j for _, j in missing)
+        j_max = max(j for _, j in missing)
+        # Cada fila va a la celda `_cell` (floor de valor / tamaño), que no
+        # siempre coincide con los bordes `i * size` en flotante (25.65 está
+        # en la celda 2565, pero 2565 * 0.01 = 25.650000000000002). Se pide
+        # media celda de más por lado y la celda la decide solo `_cell`.
+        rows = self._query(
+            db, metric,
+            (i_min - 0.5) * size, (i_max + 1.5) * size,
+            (j_min - 0.5) * size, (j_max + 1.5) * size,
+        )
+
+        fetched: Dict[Tuple[int, int], List[Row]] = {cell: [] for cell in missing}
+        for row in rows:
+            bucket = fetched.get((self._cell(row.lat), self._cell(row.lon)))
+            if bucket is not None:
+                bucket.append(row)
+
+        with self._lock:
+            for (i, j), cell_rows in fetched.items():
+                try:
+                    self._cells[(version, metric, i, j)] = cell_rows
+                except ValueError:
+                    # Celda más grande que toda la caché: se sirve sin guardarla
+                    pass
+        return fetched
+
+    def stats(self) -> dict:
+        """Contadores de aciertos/fallos (por celda) y ocupación actual."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "cells": len(self._cells),
+                "rows": self._cells.currsize,
+                "max_rows": self._cells.maxsize,
+                "ttl": self._cells.ttl,
+                "cell_size": self.cell_size,
+            }
+
+
+_bbox_cache: Optional[BBoxCache] = None
+
+
+def get_bbox_cache() -> Optional[BBoxCache]:
+    """Caché de bboxes del proceso, o None si está deshabilitada por settings."""
+    global _bbox_cache
+    settings = get_settings()
+    if not settings.bbox_cache_enabled:
+        return None
+    if _bbox_cache is None:
+        _bbox_cache = BBoxCache(
+            cell_size=settings.bbox_cache_cell_size,
+            max_rows=settings.bbox_cache_max_rows,
+            ttl=settings.bbox_cache_ttl,
+        )
+    return _bbox_cache
+
+
+def bbox_cache_stats() -> Optional[dict]:
+    cache = get_bbox_cache()
+    return cache.stats() if cache else None
+
+
+def query_area(
+    db: Session,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float
+) -> List[Row]:
+    """
+    Filas de `metric` dentro del bbox. Con `SNAPSHOT_ENABLED` se responden
+    desde el snapshot en memoria; si no, pasan por la caché (si está activa)
+    y la base.
+    """
+    if snapshot.snapshot_enabled():
+        return snapshot.get_snapshot(db).query(metric, lat_min, lat_max, lon_min, lon_max)
+    cache = get_bbox_cache()
+    if cache is not None:
+        return cache.get_rows(db, metric, lat_min, lat_max, lon_min, lon_max)
+    stmt = select_by_area(METRIC_COLUMNS[metric], lat_min, lat_max, lon_min, lon_max)
+    return db.execute(stmt).all()
 
 
 def get_population_by_area(
@@ -14,7 +304,7 @@ def get_population_by_area(
     lat_max: float,
     lon_min: float,
     lon_max: float
-) -> List[UrbanQuality]:
+) -> List[Row]:
     """
     Obtiene datos de población total (POBTOT) filtrados por área geográfica.
     
@@ -28,12 +318,7 @@ def get_population_by_area(
     Returns:
         Lista de registros con lat, lon y POBTOT dentro del área especificada
     """
-    return db.query(UrbanQuality)\
-        .filter(
-            UrbanQuality.lat.between(lat_min, lat_max),
-            UrbanQuality.lon.between(lon_min, lon_max)
-        )\
-        .all()
+    return query_area(db, "population", lat_min, lat_max, lon_min, lon_max)
 
 
 def get_education_by_area(
@@ -42,7 +327,7 @@ def get_education_by_area(
     lat_max: float,
     lon_min: float,
     lon_max: float
-) -> List[UrbanQuality]:
+) -> List[Row]:
     """
     Obtiene datos de grado promedio de escolaridad (GRAPROES, GRAPROES_F, GRAPROES_M)
     filtrados por área geográfica.
@@ -57,12 +342,7 @@ def get_education_by_area(
     Returns:
         Lista de registros con lat, lon y datos de escolaridad dentro del área especificada
     """
-    return db.query(UrbanQuality)\
-        .filter(
-            UrbanQuality.lat.between(lat_min, lat_max),
-            UrbanQuality.lon.between(lon_min, lon_max)
-        )\
-        .all()
+    return query_area(db, "education", lat_min, lat_max, lon_min, lon_max)
 
 
 def get_trees_by_area(
@@ -71,7 +351,7 @@ def get_trees_by_area(
     lat_max: float,
     lon_min: float,
     lon_max: float
-) -> List[UrbanQuality]:
+) -> List[Row]:
     """
     Obtiene datos de árboles en la calle (ARBOLES_C) filtrados por área geográfica.
     
@@ -85,9 +365,582 @@ def get_trees_by_area(
     Returns:
         Lista de registros con lat, lon y ARBOLES_C dentro del área especificada
     """
-    return db.query(UrbanQuality)\
-        .filter(
-            UrbanQuality.lat.between(lat_min, lat_max),
-            UrbanQuality.lon.between(lon_min, lon_max)
-        )\
-        .all()
+    return query_area(db, "trees", lat_min, lat_max, lon_min, lon_max)
+
+
+def stream_by_area(
+    db: Session,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[List[Row]]:
+    """
+    Igual que las consultas por área, pero lee los resultados por bloques con
+    un cursor del lado del servidor (`yield_per`) en lugar de materializarlos.
+
+    Args:
+        db: Sesión de base de datos
+        metric: Llave de `METRIC_COLUMNS` ("population", "education" o "trees")
+        lat_min: Latitud mínima del área
+        lat_max: Latitud máxima del área
+        lon_min: Longitud mínima del área
+        lon_max: Longitud máxima del área
+        chunk_size: Filas por bloque
+
+    Returns:
+        Iterador de bloques de hasta `chunk_size` filas
+    """
+    stmt = select_by_area(METRIC_COLUMNS[metric], lat_min, lat_max, lon_min, lon_max)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def get_page_by_area(
+    db: Session,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[Tuple[float, float, uuid.UUID]] = None
+) -> Tuple[List[Row], Optional[Tuple[float, float, uuid.UUID]]]:
+    """
+    Obtiene una página de puntos del área ordenada por (lat, lon, id).
+
+    La página siguiente se pide con la llave de la última fila (`after`), por
+    lo que no hay OFFSET: cada página es un range scan sobre el índice
+    `ix_urban_quality_lat_lon_id` que empieza en esa llave.
+
+    Args:
+        db: Sesión de base de datos
+        metric: Llave de `METRIC_COLUMNS` ("population", "education" o "trees")
+        lat_min: Latitud mínima del área
+        lat_max: Latitud máxima del área
+        lon_min: Longitud mínima del área
+        lon_max: Longitud máxima del área
+        limit: Tamaño máximo de la página
+        after: Llave (lat, lon, id) de la última fila de la página anterior
+
+    Returns:
+        Tupla (filas, llave siguiente). Las filas traen las columnas de la
+        métrica seguidas del id; la llave es None si ya no hay más páginas.
+    """
+    rows = db.execute(select_page(metric, lat_min, lat_max, lon_min, lon_max, limit, after)).all()
+    return _split_page(rows, limit)
+
+
+def select_page(
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    limit: int,
+    after: Optional[Tuple[float, float, uuid.UUID]] = None
+):
+    """
+    Construye el SELECT de una página keyset (ver `get_page_by_area`); pide
+    `limit + 1` filas para saber si hay una página siguiente.
+    """
+    # Aquí se filtra con rangos simples en lugar de `bbox_filter`: así el
+    # planner usa el B-tree (lat, lon, id), que ya entrega las filas en orden y
+    # permite cortar el recorrido en `limit` sin ordenar toda el área.
+    stmt = select(*METRIC_COLUMNS[metric], UrbanQuality.id).where(
+        UrbanQuality.lat.between(lat_min, lat_max),
+        UrbanQuality.lon.between(lon_min, lon_max),
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(*PAGE_KEY) > tuple_(*after))
+    return stmt.order_by(*PAGE_KEY).limit(limit + 1)
+
+
+def _split_page(rows: List[Row], limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, (last.lat, last.lon, last.id)
+
+
+def get_grid_by_area(
+    db: Session,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    cell_size: float
+) -> List[dict]:
+    """
+    Agrega los puntos del área en celdas cuadradas de `cell_size` grados.
+
+    La agregación se hace en SQL (GROUP BY sobre el índice de celda), así que
+    solo viajan las celdas con datos. Las celdas están alineadas a múltiplos de
+    `cell_size`, por lo que la misma celda da el mismo valor aunque el área
+    consultada se desplace.
+
+    Args:
+        db: Sesión de base de datos
+        metric: Llave de `GRID_AGGREGATES` ("population", "education" o "trees")
+        lat_min: Latitud mínima del área
+        lat_max: Latitud máxima del área
+        lon_min: Longitud mínima del área
+        lon_max: Longitud máxima del área
+        cell_size: Tamaño de la celda en grados
+
+    Returns:
+        Lista de celdas con su centro (lat, lon), número de puntos y los
+        agregados de la métrica en `values`
+    """
+    stmt = select_grid(metric, lat_min, lat_max, lon_min, lon_max, cell_size)
+    return _grid_cells(metric, db.execute(stmt).mappings())
+
+
+def select_grid(
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    cell_size: float
+):
+    """Construye el SELECT ... GROUP BY por celda de `get_grid_by_area`."""
+    cell_lat = func.floor(UrbanQuality.lat / cell_size)
+    cell_lon = func.floor(UrbanQuality.lon / cell_size)
+    return (
+        select(
+            ((cell_lat + 0.5) * cell_size).label("lat"),
+            ((cell_lon + 0.5) * cell_size).label("lon"),
+            func.count().label("count"),
+            *GRID_AGGREGATES[metric],
+        )
+        .where(bbox_filter(lat_min, lat_max, lon_min, lon_max))
+        .group_by(cell_lat, cell_lon)
+    )
+
+
+def _grid_cells(metric: str, rows) -> List[dict]:
+    names = [aggregate.key for aggregate in GRID_AGGREGATES[metric]]
+    return [
+        {
+            "lat": row["lat"],
+            "lon": row["lon"],
+            "count": row["count"],
+            "values": {name: row[name] for name in names},
+        }
+        for row in rows
+    ]
+
+
+# Una consulta de /batch: (lat_min, lat_max, lon_min, lon_max) y sus métricas
+BBox = Tuple[float, float, float, float]
+BatchQuery = Tuple[BBox, Sequence[str]]
+
+
+def _normalize_bbox(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> BBox:
+    lat_min, lat_max = sorted((lat_min, lat_max))
+    lon_min, lon_max = sorted((lon_min, lon_max))
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def _batch_plan(queries: Sequence[BatchQuery]) -> Tuple[List[BBox], Tuple[str, ...]]:
+    """bboxes distintos del lote y la unión de los campos de todas sus métricas."""
+    boxes = list(dict.fromkeys(_normalize_bbox(*bbox) for bbox, _ in queries))
+    fields = tuple(dict.fromkeys(
+        field for _, metrics in queries for metric in metrics for field in METRIC_FIELDS[metric]
+    ))
+    return boxes, fields
+
+
+def select_batch(boxes: Sequence[BBox], fields: Sequence[str]):
+    """
+    Construye un solo SELECT para todos los bboxes del lote:
+
+        SELECT q.idx, pts.* FROM (VALUES (0, ...), (1, ...)) AS q
+        JOIN LATERAL (SELECT ... WHERE point(lon, lat) <@ box(...)) AS pts ON true
+
+    Cada fila de `q` se resuelve con el índice GiST, y los puntos de un bbox
+    pedido para varias métricas se leen una sola vez.
+    """
+    q = values(
+        column("idx", Integer),
+        column("lat_min", Float),
+        column("lat_max", Float),
+        column("lon_min", Float),
+        column("lon_max", Float),
+        name="q",
+    ).data([(idx, *bbox) for idx, bbox in enumerate(boxes)])
+    points = (
+        select(*(getattr(UrbanQuality, field) for field in fields))
+        .where(bbox_filter(q.c.lat_min, q.c.lat_max, q.c.lon_min, q.c.lon_max))
+        .lateral("pts")
+    )
+    return select(q.c.idx, points).select_from(q.join(points, true()))
+
+
+def _group_batch(
+    queries: Sequence[BatchQuery],
+    boxes: Sequence[BBox],
+    fields: Sequence[str],
+    rows_by_box: Dict[int, List[tuple]],
+) -> List[Dict[str, List[tuple]]]:
+    """Reparte las filas de cada bbox entre las métricas de cada consulta."""
+    box_index = {bbox: idx for idx, bbox in enumerate(boxes)}
+    positions = {
+        metric: [fields.index(field) for field in METRIC_FIELDS[metric]]
+        for metric in METRIC_FIELDS
+        if all(field in fields for field in METRIC_FIELDS[metric])
+    }
+    results = []
+    for bbox, metrics in queries:
+        rows = rows_by_box.get(box_index[_normalize_bbox(*bbox)], [])
+        results.append({
+            metric: [tuple(row[i] for i in positions[metric]) for row in rows]
+            for metric in metrics
+        })
+    return results
+
+
+def _rows_by_box(result) -> Dict[int, List[tuple]]:
+    rows_by_box: Dict[int, List[tuple]] = {}
+    for row in result:
+        rows_by_box.setdefault(row[0], []).append(row[1:])
+    return rows_by_box
+
+
+def get_batch_by_area(db: Session, queries: Sequence[BatchQuery]) -> List[Dict[str, List[tuple]]]:
+    """
+    Resuelve varias consultas por área (bbox × métricas) en un solo viaje a la
+    base (ver `select_batch`). Con `SNAPSHOT_ENABLED` se responden desde el
+    snapshot en memoria.
+
+    Args:
+        db: Sesión de base de datos
+        queries: Lista de (bbox, métricas), con bbox = (lat_min, lat_max, lon_min, lon_max)
+
+    Returns:
+        Una entrada por consulta, en el mismo orden, con las filas de cada
+        métrica (tuplas en el orden de `METRIC_FIELDS`)
+    """
+    boxes, fields = _batch_plan(queries)
+    if snapshot.snapshot_enabled():
+        current = snapshot.get_snapshot(db)
+        return [
+            {metric: current.query(metric, *bbox) for metric in metrics}
+            for bbox, metrics in queries
+        ]
+    return _group_batch(queries, boxes, fields, _rows_by_box(db.execute(select_batch(boxes, fields))))
+
+
+def parse_polygon(geometry: dict):
+    """
+    Convierte un GeoJSON Polygon/MultiPolygon en una geometría de shapely
+    preparada para consultas repetidas.
+
+    Raises:
+        ValueError: Si no es un Polygon/MultiPolygon válido y no vacío
+    """
+    if geometry.get("type") not in ("Polygon", "MultiPolygon"):
+        raise ValueError("La geometría debe ser Polygon o MultiPolygon")
+    try:
+        polygon = shape(geometry)
+    except Exception as e:
+        raise ValueError(f"Geometría GeoJSON inválida: {e}")
+    if polygon.is_empty:
+        raise ValueError("La geometría está vacía")
+    if not polygon.is_valid:
+        raise ValueError(f"Geometría inválida: {shapely.validation.explain_validity(polygon)}")
+    shapely.prepare(polygon)
+    return polygon
+
+
+def _filter_in_polygon(rows: List[tuple], polygon) -> List[tuple]:
+    """Filas (con lat, lon como primeros campos) cuyo punto cae dentro de `polygon`."""
+    if not rows:
+        return rows
+    lat = np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows))
+    lon = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    inside = shapely.contains_xy(polygon, lon, lat)
+    return [rows[i] for i in np.flatnonzero(inside)]
+
+
+def query_polygon(db: Session, metric: str, polygon) -> List[tuple]:
+    """
+    Filas de `metric` dentro de un polígono.
+
+    Primero se consulta el bbox del polígono (con el índice, la caché o el
+    snapshot, igual que los endpoints por área) y después se descartan los
+    candidatos fuera del polígono con `shapely.contains_xy`, vectorizado sobre
+    todos los puntos a la vez.
+
+    Args:
+        db: Sesión de base de datos
+        metric: Llave de `METRIC_COLUMNS` ("population", "education" o "trees")
+        polygon: Geometría de `parse_polygon`
+
+    Returns:
+        Lista de filas con los campos de `METRIC_FIELDS[metric]`
+    """
+    lon_min, lat_min, lon_max, lat_max = polygon.bounds
+    rows = query_area(db, metric, lat_min, lat_max, lon_min, lon_max)
+    return _filter_in_polygon(rows, polygon)
+
+
+def _point_keys(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    # Llave pseudoaleatoria por coordenada (mezcla splitmix64 de los bits de
+    # lat/lon): el mismo punto siempre tiene la misma llave, así que la
+    # muestra no cambia entre peticiones ni con el orden de las filas
+    z = lat.view(np.uint64) * np.uint64(0x9E3779B97F4A7C15) ^ lon.view(np.uint64)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def downsample(
+    rows: List[tuple],
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    max_points: int
+) -> List[tuple]:
+    """
+    Muestra espacialmente estratificada de a lo más `max_points` filas (con
+    lat, lon como primeros campos).
+
+    El bbox se divide en una grilla de ~`max_points` celdas y cada celda
+    aporta hasta `q` puntos, con `q` el mayor cupo que cabe en el total: las
+    zonas poco densas conservan todos sus puntos y las densas se recortan
+    parejo, en lugar de que la muestra se concentre donde hay más datos.
+    Las filas conservan su orden original.
+    """
+    total = len(rows)
+    if total <= max_points:
+        return rows
+
+    lat = np.fromiter((row[0] for row in rows), dtype=np.float64, count=total)
+    lon = np.fromiter((row[1] for row in rows), dtype=np.float64, count=total)
+    lat_min, lat_max = sorted((lat_min, lat_max))
+    lon_min, lon_max = sorted((lon_min, lon_max))
+    side = math.ceil(math.sqrt(max_points))
+    row_cell = np.clip(((lat - lat_min) / max(lat_max - lat_min, 1e-12) * side).astype(np.int64), 0, side - 1)
+    col_cell = np.clip(((lon - lon_min) / max(lon_max - lon_min, 1e-12) * side).astype(np.int64), 0, side - 1)
+    cell = row_cell * side + col_cell
+
+    # Posición de cada punto dentro de su celda, en orden de llave
+    keys = _point_keys(lat, lon)
+    order = np.lexsort((keys, cell))
+    sorted_cell = cell[order]
+    rank = np.empty(total, dtype=np.int64)
+    rank[order] = np.arange(total) - np.searchsorted(sorted_cell, sorted_cell, side="left")
+
+    # Mayor cupo por celda con sum(min(puntos de la celda, cupo)) <= max_points
+    counts = np.bincount(cell)
+    counts = counts[counts > 0]
+    low, high = 0, int(counts.max())
+    while low < high:
+        quota = (low + high + 1) // 2
+        if np.minimum(counts, quota).sum() <= max_points:
+            low = quota
+        else:
+            high = quota - 1
+
+    selected = rank < low
+    # Lo que sobra del total se completa con el siguiente punto de algunas celdas
+    remaining = max_points - int(selected.sum())
+    if remaining > 0:
+        extra = np.flatnonzero(rank == low)
+        selected[extra[np.argsort(keys[extra], kind="stable")[:remaining]]] = True
+    return [rows[i] for i in np.flatnonzero(selected)]
+
+
+def select_nearest(lat: float, lon: float, limit: int):
+    """
+    SELECT de los `limit` puntos más cercanos a (lat, lon) con
+    `ORDER BY point(lon, lat) <-> point(...)`: el índice GiST
+    `ix_urban_quality_point` recorre los puntos por distancia (KNN) y se
+    detiene al llegar a `limit`, sin leer la tabla completa.
+    """
+    distance = func.point(UrbanQuality.lon, UrbanQuality.lat).op("<->")(func.point(lon, lat))
+    return select(*NEAREST_COLUMNS).order_by(distance).limit(limit)
+
+
+def _rank_nearest(rows: List[tuple], lat: float, lon: float, k: int) -> List[tuple]:
+    """Los `k` candidatos más cercanos por distancia real, con `distance_m` al final."""
+    if not rows:
+        return []
+    distances = haversine_m([row[0] for row in rows], [row[1] for row in rows], lat, lon)
+    order = np.argsort(distances, kind="stable")[:k]
+    return [(*rows[i], float(distances[i])) for i in order]
+
+
+def _nearest_complete(rows: List[tuple], ranked: List[tuple], lat: float, lon: float, limit: int) -> bool:
+    """
+    True si los `k` de `ranked` son exactos: ningún punto fuera de los
+    `limit` candidatos (más lejos en grados que el último) puede estar más
+    cerca que el k-ésimo.
+    """
+    if len(rows) < limit or not ranked:
+        # Se leyeron todos los puntos
+        return True
+    kth = ranked[-1][-1]
+    far_lat, far_lon = rows[-1][0], rows[-1][1]
+    planar = math.hypot(far_lon - lon, far_lat - lat)
+    # Un punto a `planar` grados o más está a al menos planar·M·cos(lat) metros,
+    # con cos a la latitud más alejada del ecuador que alcanza el k-ésimo y el
+    # mismo 10% de margen que el snapshot (arco sobre el paralelo vs geodésico)
+    reach = kth / METERS_PER_DEGREE
+    cos = max(math.cos(math.radians(min(abs(lat) + reach, 89.0))), 0.01)
+    return planar * METERS_PER_DEGREE * cos / 1.1 >= kth
+
+
+def get_nearest(db: Session, lat: float, lon: float, k: int) -> List[tuple]:
+    """
+    Los `k` puntos más cercanos a (lat, lon), del más cercano al más lejano.
+    Con `SNAPSHOT_ENABLED` se responde desde el snapshot en memoria.
+
+    Args:
+        db: Sesión de base de datos
+        lat: Latitud del punto de consulta
+        lon: Longitud del punto de consulta
+        k: Número de puntos
+
+    Returns:
+        Lista de filas con los campos de `NEAREST_FIELDS`
+    """
+    if snapshot.snapshot_enabled():
+        return snapshot.get_snapshot(db).nearest(lat, lon, k)
+    limit = k * NEAREST_CANDIDATES_FACTOR
+    while True:
+        rows = db.execute(select_nearest(lat, lon, limit)).all()
+        ranked = _rank_nearest(rows, lat, lon, k)
+        if _nearest_complete(rows, ranked, lat, lon, limit):
+            return ranked
+        limit *= NEAREST_CANDIDATES_FACTOR
+
+
+# === Versiones async (AsyncSession + asyncpg, con DATABASE_ASYNC=true) ===
+
+async def _run_sync_path(fn, *args):
+    """
+    Corre `fn(db, *args)` del camino sync (snapshot, caché de bboxes) en el
+    threadpool con una Session de lectura propia. Ese código filtra filas en
+    Python, puede recargar el snapshot y toma locks de hilos: en el event loop
+    (`AsyncSession.run_sync`) detendría todas las requests del worker.
+    """
+    def call():
+        db = ReadSessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
+
+
+async def query_area_async(
+    db: AsyncSession,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float
+) -> List[Row]:
+    """
+    Igual que `query_area` sobre una `AsyncSession`.
+
+    El snapshot y la caché de bboxes comparten estado con el camino sync, así
+    que se consultan con ese mismo código en el threadpool (`_run_sync_path`).
+    """
+    if snapshot.snapshot_enabled() or get_bbox_cache() is not None:
+        return await _run_sync_path(query_area, metric, lat_min, lat_max, lon_min, lon_max)
+    stmt = select_by_area(METRIC_COLUMNS[metric], lat_min, lat_max, lon_min, lon_max)
+    return (await db.execute(stmt)).all()
+
+
+async def stream_by_area_async(
+    db: AsyncSession,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> AsyncIterator[List[Row]]:
+    """Igual que `stream_by_area` sobre una `AsyncSession` (cursor de asyncpg)."""
+    stmt = select_by_area(METRIC_COLUMNS[metric], lat_min, lat_max, lon_min, lon_max)
+    result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+    try:
+        async for partition in result.partitions():
+            yield partition
+    finally:
+        await result.close()
+
+
+async def get_page_by_area_async(
+    db: AsyncSession,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[Tuple[float, float, uuid.UUID]] = None
+) -> Tuple[List[Row], Optional[Tuple[float, float, uuid.UUID]]]:
+    """Igual que `get_page_by_area` sobre una `AsyncSession`."""
+    stmt = select_page(metric, lat_min, lat_max, lon_min, lon_max, limit, after)
+    return _split_page((await db.execute(stmt)).all(), limit)
+
+
+async def get_grid_by_area_async(
+    db: AsyncSession,
+    metric: str,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    cell_size: float
+) -> List[dict]:
+    """Igual que `get_grid_by_area` sobre una `AsyncSession`."""
+    stmt = select_grid(metric, lat_min, lat_max, lon_min, lon_max, cell_size)
+    return _grid_cells(metric, (await db.execute(stmt)).mappings())
+
+
+async def get_batch_by_area_async(
+    db: AsyncSession, queries: Sequence[BatchQuery]
+) -> List[Dict[str, List[tuple]]]:
+    """Igual que `get_batch_by_area` sobre una `AsyncSession`."""
+    if snapshot.snapshot_enabled():
+        return await _run_sync_path(get_batch_by_area, queries)
+    boxes, fields = _batch_plan(queries)
+    result = await db.execute(select_batch(boxes, fields))
+    return _group_batch(queries, boxes, fields, _rows_by_box(result))
+
+
+async def get_nearest_async(db: AsyncSession, lat: float, lon: float, k: int) -> List[tuple]:
+    """Igual que `get_nearest` sobre una `AsyncSession`."""
+    if snapshot.snapshot_enabled():
+        return await _run_sync_path(get_nearest, lat, lon, k)
+    limit = k * NEAREST_CANDIDATES_FACTOR
+    while True:
+        rows = (await db.execute(select_nearest(lat, lon, limit))).all()
+        ranked = _rank_nearest(rows, lat, lon, k)
+        if _nearest_complete(rows, ranked, lat, lon, limit):
+            return ranked
+        limit *= NEAREST_CANDIDATES_FACTOR
+
+
+async def query_polygon_async(db: AsyncSession, metric: str, polygon) -> List[tuple]:
+    """Igual que `query_polygon` sobre una `AsyncSession`."""
+    lon_min, lat_min, lon_max, lat_max = polygon.bounds
+    rows = await query_area_async(db, metric, lat_min, lat_max, lon_min, lon_max)
+    return _filter_in_polygon(rows, polygon)
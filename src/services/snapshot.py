@@ -0,0 +1,218 @@
+"""
+Snapshot columnar en memoria de `urban_quality`.
+
+El dataset es de solo lectura entre cargas del ETL y cabe en RAM, así que
+con `SNAPSHOT_ENABLED=true` se carga al arrancar en arreglos de NumPy (una
+columna por arreglo) ordenados por latitud. Las consultas por bbox se
+resuelven con `searchsorted` sobre la latitud y una máscara vectorizada sobre
+la longitud, sin ir a la base.
+"""
+
+import io
+import threading
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.settings import get_settings
+from src.models.urban_quality import UrbanQuality
+from src.services.dataset_version import get_dataset_version
+from src.utils.helpers import METERS_PER_DEGREE, haversine_m
+
+# Columnas que se cargan: las de los tres endpoints por bbox
+SNAPSHOT_COLUMNS = ("lat", "lon", "POBTOT", "GRAPROES", "GRAPROES_F", "GRAPROES_M", "ARBOLES_C")
+INTEGER_COLUMNS = {"POBTOT", "ARBOLES_C"}
+
+SNAPSHOT_FIELDS = {
+    "population": ("lat", "lon", "POBTOT"),
+    "education": ("lat", "lon", "GRAPROES", "GRAPROES_F", "GRAPROES_M"),
+    "trees": ("lat", "lon", "ARBOLES_C"),
+}
+
+# Radio inicial (grados) de la ventana de búsqueda de `nearest`
+NEAREST_START_RADIUS = 0.005
+
+# Filas ligeras con acceso por nombre, igual que las `Row` de SQLAlchemy
+ROW_TYPES = {
+    metric: namedtuple(f"{metric.capitalize()}Row", fields)
+    for metric, fields in SNAPSHOT_FIELDS.items()
+}
+
+
+class UrbanQualitySnapshot:
+    """
+    Columnas de `urban_quality` en memoria, ordenadas por latitud.
+
+    Las columnas enteras sin nulos se guardan como int64; si tienen nulos se
+    guardan como float64 con NaN y se convierten a None al responder.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], version: str):
+        order = np.argsort(columns["lat"], kind="stable")
+        self.columns = {name: np.ascontiguousarray(values[order]) for name, values in columns.items()}
+        self.version = version
+        self.size = len(order)
+        self._nullable = {
+            name for name, values in self.columns.items()
+            if values.dtype.kind == "f" and np.isnan(values).any()
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], version: str) -> "UrbanQualitySnapshot":
+        """Construye el snapshot a partir de arreglos float64 (nulos como NaN)."""
+        columns = {}
+        for name in SNAPSHOT_COLUMNS:
+            array = np.asarray(arrays[name], dtype=np.float64)
+            if name in INTEGER_COLUMNS and not np.isnan(array).any():
+                array = array.astype(np.int64)
+            columns[name] = array
+        return cls(columns, version)
+
+    @classmethod
+    def from_rows(cls, rows, version: str) -> "UrbanQualitySnapshot":
+        """Construye el snapshot a partir de tuplas en el orden de `SNAPSHOT_COLUMNS`."""
+        raw = list(zip(*rows)) if rows else [()] * len(SNAPSHOT_COLUMNS)
+        arrays = {
+            name: np.array(values, dtype=np.float64)
+            for name, values in zip(SNAPSHOT_COLUMNS, raw)
+        }
+        return cls.from_arrays(arrays, version)
+
+    @classmethod
+    def load(cls, db: Session) -> "UrbanQualitySnapshot":
+        """Lee las columnas de `urban_quality` desde la base."""
+        version = get_dataset_version(db)
+        stmt = select(*(getattr(UrbanQuality, name) for name in SNAPSHOT_COLUMNS))
+
+        cursor = db.connection().connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2: COPY a CSV y parseo con pandas es varias veces más
+                # rápido que construir 1M+ filas de Python una por una
+                buffer = io.BytesIO()
+                sql = str(stmt.compile(db.get_bind()))
+                cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", buffer)
+                buffer.seek(0)
+                frame = pd.read_csv(buffer, header=None, names=SNAPSHOT_COLUMNS, dtype=np.float64)
+                return cls.from_arrays({name: frame[name].to_numpy() for name in SNAPSHOT_COLUMNS}, version)
+        finally:
+            cursor.close()
+
+        return cls.from_rows(db.execute(stmt).all(), version)
+
+    def mask(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> np.ndarray:
+        """Índices (dentro del orden por latitud) de los puntos en el bbox."""
+        lat_min, lat_max = sorted((lat_min, lat_max))
+        lon_min, lon_max = sorted((lon_min, lon_max))
+        lat = self.columns["lat"]
+        start = np.searchsorted(lat, lat_min, side="left")
+        stop = np.searchsorted(lat, lat_max, side="right")
+        lon = self.columns["lon"][start:stop]
+        return start + np.flatnonzero((lon >= lon_min) & (lon <= lon_max))
+
+    def column_values(self, name: str, index: np.ndarray) -> list:
+        """Valores de la columna en `index` como objetos de Python (NaN → None)."""
+        values = self.columns[name][index]
+        if name not in self._nullable:
+            return values.tolist()
+        cast = int if name in INTEGER_COLUMNS else float
+        return [None if v != v else cast(v) for v in values.tolist()]
+
+    def query(
+        self,
+        metric: str,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float
+    ) -> List[tuple]:
+        """Filas de `metric` dentro del bbox, con los mismos campos que la consulta SQL."""
+        index = self.mask(lat_min, lat_max, lon_min, lon_max)
+        row_type = ROW_TYPES[metric]
+        columns = [self.column_values(name, index) for name in SNAPSHOT_FIELDS[metric]]
+        return list(map(row_type._make, zip(*columns)))
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[tuple]:
+        """
+        Los `k` puntos más cercanos a (lat, lon), del más cercano al más lejano.
+
+        Busca en una ventana alrededor del punto (`mask`) y la agranda hasta
+        que contiene `k` puntos y la distancia del k-ésimo cabe en ella, así
+        que solo se calculan distancias de los candidatos cercanos.
+
+        Returns:
+            Tuplas con las columnas de `SNAPSHOT_COLUMNS` más la distancia en metros
+        """
+        k = min(k, self.size)
+        if k <= 0:
+            return []
+        radius = NEAREST_START_RADIUS
+        while True:
+            if radius >= 90:
+                index = np.arange(self.size)
+            else:
+                # Los grados de longitud se acortan con la latitud; 10% de margen
+                # porque el arco sobre el paralelo es más largo que el geodésico
+                lon_radius = 1.1 * radius / max(np.cos(np.radians(min(abs(lat) + radius, 89.0))), 0.01)
+                index = self.mask(lat - radius, lat + radius, lon - lon_radius, lon + lon_radius)
+            if len(index) >= k:
+                distances = haversine_m(self.columns["lat"][index], self.columns["lon"][index], lat, lon)
+                kth = np.partition(distances, k - 1)[k - 1]
+                if radius >= 90 or kth <= radius * METERS_PER_DEGREE:
+                    break
+                # La ventana con radio = distancia del k-ésimo ya tiene k puntos
+                radius = max(radius * 2, kth / METERS_PER_DEGREE)
+            else:
+                radius *= 4
+
+        order = np.argsort(distances, kind="stable")[:k]
+        index = index[order]
+        columns = [self.column_values(name, index) for name in SNAPSHOT_COLUMNS]
+        return list(zip(*columns, distances[order].tolist()))
+
+
+_lock = threading.Lock()
+_snapshot: Optional[UrbanQualitySnapshot] = None
+
+
+def snapshot_enabled() -> bool:
+    return get_settings().snapshot_enabled
+
+
+def load_snapshot(db: Session) -> UrbanQualitySnapshot:
+    """Carga (o recarga) el snapshot del proceso."""
+    global _snapshot
+    with _lock:
+        _snapshot = UrbanQualitySnapshot.load(db)
+        return _snapshot
+
+
+def get_snapshot(db: Session) -> UrbanQualitySnapshot:
+    """
+    Snapshot vigente. Si la versión del dataset cambió (nueva carga del ETL)
+    se recarga antes de responder.
+    """
+    global _snapshot
+    version = get_dataset_version(db)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = UrbanQualitySnapshot.load(db)
+        return _snapshot
+
+
+def snapshot_stats() -> Optional[dict]:
+    snapshot = _snapshot
+    if snapshot is None:
+        return None
+    return {
+        "version": snapshot.version,
+        "rows": snapshot.size,
+        "bytes": int(sum(values.nbytes for values in snapshot.columns.values())),
+    }
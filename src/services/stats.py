@@ -0,0 +1,79 @@
+"""
+Estadísticas resumidas precalculadas para dashboards.
+
+Las vistas materializadas (migración c4d1e9a7f352) agregan `urban_quality`
+por región de 0.05° y `unequality_indicators` por municipio y sistema urbano,
+más una fila total. Se recalculan al final de `scripts/loadto_db.py`, así que
+`/api/v1/stats` responde leyendo unas cuantas filas por índice en lugar de
+recorrer los datos crudos.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import column, literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+LOGGER = logging.getLogger(__name__)
+
+# dataset → (vista materializada, niveles disponibles)
+STATS_VIEWS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "urban_quality": ("mv_urban_quality_stats", ("total", "region")),
+    "unequality_indicators": ("mv_unequality_stats", ("total", "sun", "municipality")),
+}
+
+
+def refresh_summary_views(db: Session) -> None:
+    """
+    Recalcula las vistas de estadísticas. Usa `REFRESH ... CONCURRENTLY` (las
+    consultas a /stats no se bloquean mientras tanto) cuando la vista ya tiene
+    datos; la primera vez hace un refresh normal.
+    """
+    for view, _ in STATS_VIEWS.values():
+        populated = db.execute(
+            text("SELECT ispopulated FROM pg_matviews WHERE matviewname = :view"),
+            {"view": view},
+        ).scalar()
+        if populated is None:
+            LOGGER.warning("Vista %s no existe; ejecuta `alembic upgrade head`", view)
+            continue
+        concurrently = " CONCURRENTLY" if populated else ""
+        db.execute(text(f"REFRESH MATERIALIZED VIEW{concurrently} {view}"))
+        db.commit()
+        LOGGER.info("Vista %s actualizada", view)
+
+
+def get_stats(
+    db: Session, dataset: str, level: str, key: Optional[str] = None
+) -> List[dict]:
+    """
+    Filas de estadísticas de un dataset.
+
+    Args:
+        db: Sesión de base de datos
+        dataset: Llave de `STATS_VIEWS` ("urban_quality" o "unequality_indicators")
+        level: Nivel de agregación (ver `STATS_VIEWS`)
+        key: Clave del grupo (p. ej. "19039" para un municipio); None para todos
+
+    Returns:
+        Lista de filas de la vista como diccionarios
+    """
+    return [dict(row) for row in db.execute(select_stats(dataset, level, key)).mappings()]
+
+
+async def get_stats_async(
+    db: AsyncSession, dataset: str, level: str, key: Optional[str] = None
+) -> List[dict]:
+    """Igual que `get_stats` sobre una `AsyncSession`."""
+    result = await db.execute(select_stats(dataset, level, key))
+    return [dict(row) for row in result.mappings()]
+
+
+def select_stats(dataset: str, level: str, key: Optional[str] = None):
+    view, _ = STATS_VIEWS[dataset]
+    stats = table(view, column("level"), column("key"))
+    stmt = select(literal_column("*")).select_from(stats).where(stats.c.level == level)
+    if key is not None:
+        stmt = stmt.where(stats.c.key == key)
+    return stmt.order_by(stats.c.key)
@@ -0,0 +1,142 @@
+"""
+Servicio de vector tiles (MVT) para los puntos de Urban Quality.
+
+Los tiles se generan a partir de la consulta por bounding box y se guardan en
+una caché LRU en memoria (y opcionalmente en disco, con `TILE_CACHE_DIR`). La
+llave incluye la versión del dataset, así que una carga nueva invalida todos
+los tiles anteriores sin necesidad de borrarlos.
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+from cachetools import LRUCache
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.settings import get_settings
+from src.models.urban_quality import UrbanQuality
+from src.services.dataset_version import get_dataset_version
+from src.services.service import bbox_filter, downsample
+from src.utils import mvt
+
+LAYER_NAME = "urban_quality"
+
+# Atributos que se pueden incluir en los tiles
+TILE_ATTRIBUTES = (
+    "POBTOT", "GRAPROES", "GRAPROES_F", "GRAPROES_M",
+    "RECUCALL_C", "RAMPAS_C", "PASOPEAT_C", "BANQUETA_C", "GUARNICI_C",
+    "CICLOVIA_C", "CICLOCAR_C", "ALUMPUB_C", "LETRERO_C", "TELPUB_C",
+    "ARBOLES_C", "DRENAJEP_C", "TRANSCOL_C", "ACESOPER_C", "ACESOAUT_C",
+)
+DEFAULT_TILE_ATTRIBUTES = ("POBTOT", "GRAPROES", "ARBOLES_C")
+
+# Debajo de MIN_ZOOM un tile cubre todo el dataset (zona metropolitana)
+MIN_ZOOM = 5
+MAX_ZOOM = 22
+# Puntos por tile: arriba de eso se codifica una muestra estratificada
+# (`service.downsample`) para que los zooms bajos no pesen varios MB
+MAX_TILE_FEATURES = 20_000
+# Margen en unidades del tile para que los símbolos en el borde no se corten
+TILE_BUFFER = 64
+
+TileKey = Tuple[str, int, int, int, Tuple[str, ...]]
+
+_lock = threading.Lock()
+_memory_cache: Optional[LRUCache] = None
+
+
+def _cache() -> LRUCache:
+    global _memory_cache
+    if _memory_cache is None:
+        _memory_cache = LRUCache(maxsize=get_settings().tile_cache_size)
+    return _memory_cache
+
+
+def _disk_path(key: TileKey) -> Optional[Path]:
+    cache_dir = get_settings().tile_cache_dir
+    if not cache_dir:
+        return None
+    version, z, x, y, attributes = key
+    return Path(cache_dir) / version / "-".join(attributes) / str(z) / str(x) / f"{y}.mvt"
+
+
+def _cache_get(key: TileKey) -> Optional[bytes]:
+    with _lock:
+        tile = _cache().get(key)
+    if tile is not None:
+        return tile
+
+    path = _disk_path(key)
+    if path is not None and path.exists():
+        tile = path.read_bytes()
+        with _lock:
+            _cache()[key] = tile
+    return tile
+
+
+def _cache_put(key: TileKey, tile: bytes) -> None:
+    with _lock:
+        _cache()[key] = tile
+
+    path = _disk_path(key)
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Escritura atómica: otros workers nunca leen un tile a medias
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as file:
+        file.write(tile)
+    os.replace(tmp, path)
+
+
+def render_tile(
+    db: Session, z: int, x: int, y: int, attributes: Sequence[str]
+) -> bytes:
+    """
+    Genera el tile z/x/y con una capa `urban_quality` de puntos y los
+    atributos indicados, con a lo más `MAX_TILE_FEATURES` puntos.
+    """
+    lat_min, lat_max, lon_min, lon_max = mvt.tile_bounds(z, x, y)
+    margin = TILE_BUFFER / mvt.EXTENT
+    lat_pad = (lat_max - lat_min) * margin
+    lon_pad = (lon_max - lon_min) * margin
+
+    bounds = (lat_min - lat_pad, lat_max + lat_pad, lon_min - lon_pad, lon_max + lon_pad)
+    columns = [getattr(UrbanQuality, name) for name in attributes]
+    stmt = select(UrbanQuality.lat, UrbanQuality.lon, *columns).where(bbox_filter(*bounds))
+    rows = downsample(db.execute(stmt).all(), *bounds, MAX_TILE_FEATURES)
+
+    def points():
+        for row in rows:
+            px, py = mvt.project(row[0], row[1], z, x, y)
+            yield px, py, row[2:]
+
+    return mvt.encode_point_layer(LAYER_NAME, points(), attributes)
+
+
+def get_tile(
+    db: Session, z: int, x: int, y: int, attributes: Sequence[str] = DEFAULT_TILE_ATTRIBUTES
+) -> bytes:
+    """
+    Regresa el tile z/x/y desde la caché o lo genera y lo guarda.
+
+    Args:
+        db: Sesión de base de datos
+        z: Nivel de zoom
+        x: Columna del tile
+        y: Fila del tile (esquema XYZ, origen arriba-izquierda)
+        attributes: Atributos de `TILE_ATTRIBUTES` a incluir en cada punto
+
+    Returns:
+        Tile codificado como Mapbox Vector Tile
+    """
+    key = (get_dataset_version(db), z, x, y, tuple(attributes))
+    tile = _cache_get(key)
+    if tile is None:
+        tile = render_tile(db, z, x, y, attributes)
+        _cache_put(key, tile)
+    return tile
@@ -0,0 +1,50 @@
+import base64
+import uuid
+from typing import Tuple
+
+import numpy as np
+import orjson
+
+# Radio medio de la Tierra y longitud de un grado de latitud, en metros
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180.0
+
+
+def encode_cursor(key: Tuple[float, float, uuid.UUID]) -> str:
+
+    # Codifica la llave keyset (lat, lon, id) como cursor opaco (base64 url-safe)
+
+    lat, lon, row_id = key
+    raw = orjson.dumps([lat, lon, str(row_id)])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, float, uuid.UUID]:
+
+    # Decodifica un cursor generado por encode_cursor; lanza ValueError si es inválido
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = orjson.loads(base64.urlsafe_b64decode(padded))
+        # Un cursor válido es [lat, lon, "id"]; cualquier otra forma es falsificado
+        if not (
+            isinstance(key, list) and len(key) == 3
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in key[:2])
+            and isinstance(key[2], str)
+        ):
+            raise ValueError("forma inválida")
+        lat, lon, row_id = key
+        return float(lat), float(lon), uuid.UUID(row_id)
+    except (ValueError, TypeError, AttributeError, orjson.JSONDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor!r}") from e
+
+
+def haversine_m(lat, lon, lat0: float, lon0: float) -> np.ndarray:
+
+    # Distancia de círculo máximo (metros) de cada punto (lat, lon) a (lat0, lon0); acepta arreglos
+
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    dlat = lat - np.radians(lat0)
+    dlon = np.radians(np.asarray(lon, dtype=np.float64) - lon0)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(np.radians(lat0)) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
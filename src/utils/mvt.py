@@ -0,0 +1,123 @@
+import math
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Codificador mínimo de Mapbox Vector Tiles (spec 2.1) para capas de puntos.
+# Escribe el protobuf a mano para no depender de PostGIS (ST_AsMVT) ni de
+# librerías extra: solo se necesitan Tile.layers, Layer y Feature tipo POINT.
+
+EXTENT = 4096
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+_POINT = 1
+_MOVE_TO_ONE = (1 & 0x7) | (1 << 3)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+
+    # Regresa (lat_min, lat_max, lon_min, lon_max) del tile z/x/y (Web Mercator, esquema XYZ)
+
+    n = 2 ** z
+    lon_min = x / n * 360.0 - 180.0
+    lon_max = (x + 1) / n * 360.0 - 180.0
+    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def project(lat: float, lon: float, z: int, x: int, y: int, extent: int = EXTENT) -> Tuple[int, int]:
+
+    # Proyecta lat/lon a coordenadas enteras dentro del tile (origen arriba-izquierda)
+
+    n = 2 ** z
+    lat_rad = math.radians(lat)
+    px = ((lon + 180.0) / 360.0 * n - x) * extent
+    py = ((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n - y) * extent
+    return int(round(px)), int(round(py))
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value) -> bytes:
+    # Value: double_value = 3, int64_value = 4, bool_value = 7, string_value = 1
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(4, 0) + _varint(value & 0xFFFFFFFFFFFFFFFF)
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def encode_point_layer(
+    name: str,
+    points: Iterable[Tuple[int, int, Sequence[Optional[object]]]],
+    keys: Sequence[str],
+    extent: int = EXTENT,
+) -> bytes:
+
+    # Codifica un tile con una sola capa de puntos.
+    # points: iterable de (px, py, valores) ya proyectados al tile; valores en el orden de keys.
+    # Los valores None no generan tag.
+
+    values: List[object] = []
+    value_index: Dict[Tuple[type, object], int] = {}
+    features = bytearray()
+
+    for px, py, attrs in points:
+        tags: List[int] = []
+        for key_idx, value in enumerate(attrs):
+            if value is None:
+                continue
+            if isinstance(value, float) and math.isnan(value):
+                continue
+            marker = (type(value), value)
+            idx = value_index.get(marker)
+            if idx is None:
+                idx = value_index[marker] = len(values)
+                values.append(value)
+            tags.extend((key_idx, idx))
+
+        feature = b""
+        if tags:
+            feature += _packed(2, tags)
+        feature += _key(3, 0) + _varint(_POINT)
+        feature += _packed(4, (_MOVE_TO_ONE, _zigzag(px), _zigzag(py)))
+        features += _bytes_field(2, feature)
+
+    layer = _key(15, 0) + _varint(2)
+    layer += _bytes_field(1, name.encode("utf-8"))
+    layer += bytes(features)
+    for key in keys:
+        layer += _bytes_field(3, key.encode("utf-8"))
+    for value in values:
+        layer += _bytes_field(4, _encode_value(value))
+    layer += _key(5, 0) + _varint(extent)
+
+    return _bytes_field(3, layer)
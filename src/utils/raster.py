@@ -0,0 +1,68 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+
+# Codificadores mínimos de rasters: PNG RGBA de 8 bits (escrito a mano con
+# zlib, sin Pillow) y .npy (el formato nativo de NumPy) para los valores crudos.
+
+PNG_MEDIA_TYPE = "image/png"
+NPY_MEDIA_TYPE = "application/x-npy"
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Rampa de color del heatmap (amarillo claro → naranja → rojo oscuro), de 0 a 1
+_RAMP_STOPS = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+_RAMP_COLORS = np.array([
+    [255, 255, 178],
+    [254, 204, 92],
+    [253, 141, 60],
+    [240, 59, 32],
+    [189, 0, 38],
+], dtype=np.float64)
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+
+    # Codifica un arreglo (alto, ancho, 4) uint8 como PNG RGBA, sin filtro por fila
+
+    height, width, _ = rgba.shape
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # byte 0 de cada fila: filtro 0
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        _PNG_SIGNATURE
+        + _chunk(b"IHDR", header)
+        + _chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + _chunk(b"IEND", b"")
+    )
+
+
+def colorize(grid: np.ndarray) -> np.ndarray:
+
+    # Mapea la grilla a la rampa de color, escalando linealmente de 0 al máximo.
+    # Las celdas sin datos (NaN) o en 0 quedan transparentes.
+
+    values = np.where(np.isfinite(grid), grid, 0.0)
+    high = values.max() if values.size else 0.0
+    scaled = np.clip(values / high, 0.0, 1.0) if high > 0 else np.zeros_like(values)
+
+    rgba = np.empty(grid.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(scaled, _RAMP_STOPS, _RAMP_COLORS[:, channel])
+    rgba[..., 3] = np.where(values > 0, 255, 0)
+    return rgba
+
+
+def encode_npy(grid: np.ndarray) -> bytes:
+
+    # Serializa la grilla en formato .npy (se lee con numpy.load)
+
+    buffer = io.BytesIO()
+    np.save(buffer, grid, allow_pickle=False)
+    return buffer.getvalue()
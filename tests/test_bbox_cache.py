@@ -0,0 +1,47 @@
+# tests/test_bbox_cache.py
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services import service
+from src.services.service import BBoxCache
+
+Row = namedtuple("Row", ("lat", "lon", "POBTOT"))
+
+# 25.65 cae en la celda 2565, cuyo borde inferior en flotante es 25.650000000000002
+ROWS = [Row(25.645, -100.305, 1), Row(25.65, -100.305, 2), Row(25.655, -100.305, 3)]
+
+
+class MemoryBBoxCache(BBoxCache):
+    # Filtra ROWS con los mismos bordes inclusivos que `bbox_filter`
+    def _query(self, db, metric, lat_min, lat_max, lon_min, lon_max):
+        return [
+            row for row in ROWS
+            if lat_min <= row.lat <= lat_max and lon_min <= row.lon <= lon_max
+        ]
+
+
+def _cache(monkeypatch):
+    monkeypatch.setattr(service, "get_dataset_version", lambda db: "1")
+    return MemoryBBoxCache(cell_size=0.01, max_rows=1000, ttl=60)
+
+
+def test_rows_on_cell_boundary_are_kept(monkeypatch):
+    cache = _cache(monkeypatch)
+    # Con la celda 2564 ya en caché, la 2565 se consulta sola
+    cache.get_rows(None, "population", 25.641, 25.649, -100.31, -100.30)
+    rows = cache.get_rows(None, "population", 25.641, 25.659, -100.31, -100.30)
+
+    assert sorted(row.POBTOT for row in rows) == [1, 2, 3]
+
+
+def test_boundary_row_outside_bbox_is_excluded(monkeypatch):
+    cache = _cache(monkeypatch)
+    rows = cache.get_rows(None, "population", 25.6500001, 25.69, -100.31, -100.30)
+
+    assert sorted(row.POBTOT for row in rows) == [3]
+    # Segunda lectura desde caché: mismo resultado
+    rows = cache.get_rows(None, "population", 25.6500001, 25.69, -100.31, -100.30)
+    assert sorted(row.POBTOT for row in rows) == [3]
@@ -0,0 +1,67 @@
+# tests/test_conditional.py
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api import conditional
+from src.services.dataset_version import VersionInfo
+
+CALLS = []
+
+
+def _endpoint(request):
+    CALLS.append(request.url.path)
+    return PlainTextResponse("ok")
+
+
+def _client(monkeypatch, version: str = "7") -> TestClient:
+    info = VersionInfo(version, datetime(2025, 10, 14, 12, 0, tzinfo=timezone.utc))
+    monkeypatch.setattr(conditional, "cached_version_info", lambda: info)
+    app = Starlette(routes=[Route("/api/v1/population", _endpoint), Route("/other", _endpoint)])
+    app.add_middleware(conditional.ConditionalGetMiddleware, prefix="/api/v1")
+    return TestClient(app)
+
+
+def test_etag_ignores_parameter_order():
+    # Los mismos parámetros en otro orden son la misma consulta
+    assert conditional.make_etag("1", "/p", "a=1&b=2", None) == conditional.make_etag("1", "/p", "b=2&a=1", None)
+    assert conditional.make_etag("1", "/p", "a=1", None) != conditional.make_etag("2", "/p", "a=1", None)
+    assert conditional.make_etag("1", "/p", "a=1", None) != conditional.make_etag("1", "/p", "a=1", "application/x-ndjson")
+
+
+def test_conditional_get(monkeypatch):
+    CALLS.clear()
+    client = _client(monkeypatch)
+
+    response = client.get("/api/v1/population?lat_min=1")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert etag.startswith('W/"v7-')
+    assert response.headers["last-modified"] == "Tue, 14 Oct 2025 12:00:00 GMT"
+
+    # If-None-Match vigente: 304 sin ejecutar el endpoint
+    response = client.get("/api/v1/population?lat_min=1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert CALLS == ["/api/v1/population"]
+
+    # Comparación débil: también coincide sin el prefijo W/
+    response = client.get("/api/v1/population?lat_min=1", headers={"If-None-Match": etag[2:]})
+    assert response.status_code == 304
+
+    # Fuera del prefijo no se agrega ETag
+    assert "etag" not in client.get("/other").headers
+
+
+def test_new_version_invalidates_etag(monkeypatch):
+    etag = _client(monkeypatch, "7").get("/api/v1/population").headers["etag"]
+    response = _client(monkeypatch, "8").get("/api/v1/population", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,38 @@
+# tests/test_downsample.py
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services.service import downsample
+
+
+def _rows():
+    # Un cúmulo denso en una esquina y puntos aislados en el resto del área
+    rng = np.random.default_rng(7)
+    dense = [(float(lat), float(lon), 1) for lat, lon in rng.uniform(0.0, 0.1, size=(5000, 2))]
+    sparse = [(0.5 + i * 0.05, 0.5 + i * 0.05, 2) for i in range(10)]
+    return dense + sparse
+
+
+def test_downsample_keeps_sparse_areas():
+    rows = _rows()
+    sample = downsample(rows, 0.0, 1.0, 0.0, 1.0, 100)
+    assert len(sample) == 100
+    # Los puntos aislados sobreviven; el recorte cae sobre el cúmulo
+    assert sum(1 for row in sample if row[2] == 2) == 10
+    # Subconjunto en el orden original
+    positions = [rows.index(row) for row in sample]
+    assert positions == sorted(positions)
+
+
+def test_downsample_is_deterministic():
+    rows = _rows()
+    assert downsample(rows, 0.0, 1.0, 0.0, 1.0, 300) == downsample(rows[::-1], 0.0, 1.0, 0.0, 1.0, 300)[::-1]
+
+
+def test_downsample_small_result_unchanged():
+    rows = _rows()[:50]
+    assert downsample(rows, 0.0, 1.0, 0.0, 1.0, 100) is rows
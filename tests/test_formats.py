@@ -0,0 +1,50 @@
+# tests/test_formats.py
+import sys
+from pathlib import Path
+
+import orjson
+import pytest
+from starlette.requests import Request
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api import formats
+
+ROWS = [(19.4, -99.1, 10), (19.5, -99.2, None)]
+FIELDS = ("lat", "lon", "POBTOT")
+TYPES = {"lat": float, "lon": float, "POBTOT": int}
+
+
+def _request(accept: str = "") -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+@pytest.mark.parametrize(
+    "accept, format, expected",
+    [
+        ("", None, "json"),
+        ("application/x-ndjson", None, "ndjson"),
+        ("text/html, application/vnd.apache.arrow.stream;q=0.9", None, "arrow"),
+        ("application/x-ndjson", "columnar", "columnar"),
+    ],
+)
+def test_negotiate(accept, format, expected):
+    assert formats.negotiate(_request(accept), format) == expected
+
+
+def test_render_json_and_columnar():
+    rows = orjson.loads(formats.render("json", ROWS, FIELDS, TYPES).body)
+    assert rows == [{"lat": 19.4, "lon": -99.1, "POBTOT": 10}, {"lat": 19.5, "lon": -99.2, "POBTOT": None}]
+
+    columns = orjson.loads(formats.render("columnar", ROWS, FIELDS, TYPES).body)
+    assert columns == {"lat": [19.4, 19.5], "lon": [-99.1, -99.2], "POBTOT": [10, None]}
+    assert orjson.loads(formats.render("columnar", [], FIELDS, TYPES).body) == {f: [] for f in FIELDS}
+
+
+def test_render_arrow():
+    pa = pytest.importorskip("pyarrow")
+    response = formats.render("arrow", ROWS, FIELDS, TYPES, {"X-Next-Cursor": "abc"})
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert response.headers["x-next-cursor"] == "abc"
+    assert table.schema.field("POBTOT").type == pa.int64()
+    assert table.column("POBTOT").to_pylist() == [10, None]
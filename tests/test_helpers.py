@@ -0,0 +1,34 @@
+# tests/test_helpers.py
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.helpers import encode_cursor, decode_cursor
+
+
+def test_cursor_roundtrip():
+    # El cursor debe regresar exactamente la misma llave (lat, lon, id)
+    key = (25.6714, -100.3093, uuid.uuid4())
+    cursor = encode_cursor(key)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == key
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "no-es-base64", "W10", "WzEsMiwieCJd",
+    # JSON bien formado con otra forma: id no string, dict, 4 elementos,
+    # lat como string o bool, string suelto y null
+    "WzEsMiwzXQ", "eyJhIjoxfQ", "WzEsMiwieCIsInkiXQ",
+    "WyIxIiwyLCIwMDAwMDAwMC0wMDAwLTAwMDAtMDAwMC0wMDAwMDAwMDAwMDAiXQ",
+    "W3RydWUsMiwiMDAwMDAwMDAtMDAwMC0wMDAwLTAwMDAtMDAwMDAwMDAwMDAwIl0",
+    "ImFiYyI", "bnVsbA",
+])
+def test_decode_cursor_invalid(cursor):
+    # Cursores corruptos o alterados se reportan como ValueError
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,49 @@
+# tests/test_inequality_index.py
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services.inequality_index import INDEX_COLUMNS, InequalityIndex
+
+
+def _row(cvegeo, wkt):
+    values = {name: None for name in INDEX_COLUMNS}
+    values.update(cvegeo=cvegeo, POBTOT=100)
+    return (*(values[name] for name in INDEX_COLUMNS), wkt)
+
+
+ROWS = [
+    _row("A", "POLYGON ((-100.4 25.6, -100.3 25.6, -100.3 25.7, -100.4 25.7, -100.4 25.6))"),
+    _row("B", "POLYGON ((-100.3 25.6, -100.2 25.6, -100.2 25.7, -100.3 25.7, -100.3 25.6))"),
+    _row("sin-geometria", None),
+    _row("invalida", "POLYGON ((-100.4"),
+]
+
+
+def test_locates_containing_polygon():
+    index = InequalityIndex.from_rows(ROWS, version="v1")
+
+    assert index.cvegeo_at([25.65, 25.65, 25.0], [-100.35, -100.25, -100.35]) == ["A", "B", None]
+
+
+def test_skips_missing_and_invalid_wkt():
+    index = InequalityIndex.from_rows(ROWS, version="v1")
+
+    assert (index.size, index.skipped) == (2, 2)
+
+
+def test_boundary_is_not_contained():
+    # Igual que ST_Contains: el borde compartido entre A y B no cuenta
+    index = InequalityIndex.from_rows(ROWS, version="v1")
+
+    assert index.cvegeo_at([25.65], [-100.3]) == [None]
+
+
+def test_rows_carry_payload_fields():
+    index = InequalityIndex.from_rows(ROWS, version="v1")
+    (row,) = index.rows_at([25.65], [-100.35])
+
+    assert row["cvegeo"] == "A"
+    assert row["POBTOT"] == 100
+    assert set(row) == set(INDEX_COLUMNS)
@@ -0,0 +1,54 @@
+# tests/test_polygon.py
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services.service import _filter_in_polygon, parse_polygon
+
+TRIANGLE = {
+    "type": "Polygon",
+    "coordinates": [[[-100.4, 25.6], [-100.2, 25.6], [-100.3, 25.8], [-100.4, 25.6]]],
+}
+
+
+def test_filter_keeps_points_inside_polygon():
+    # Todos los puntos están en el bbox del triángulo, solo dos dentro de él
+    rows = [
+        (25.65, -100.30, 10),
+        (25.75, -100.30, 20),
+        (25.75, -100.39, 30),
+        (25.79, -100.21, 40),
+    ]
+    polygon = parse_polygon(TRIANGLE)
+
+    assert _filter_in_polygon(rows, polygon) == [(25.65, -100.30, 10), (25.75, -100.30, 20)]
+    assert _filter_in_polygon([], polygon) == []
+
+
+def test_multipolygon():
+    polygon = parse_polygon({
+        "type": "MultiPolygon",
+        "coordinates": [
+            TRIANGLE["coordinates"],
+            [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]],
+        ],
+    })
+
+    assert _filter_in_polygon([(0.5, 0.5, 1), (2, 2, 2)], polygon) == [(0.5, 0.5, 1)]
+
+
+@pytest.mark.parametrize(
+    "geometry",
+    [
+        {"type": "Point", "coordinates": [-100.3, 25.7]},
+        {"type": "Polygon", "coordinates": [[[0, 0]]]},
+        # Moño: se cruza a sí mismo
+        {"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]},
+    ],
+)
+def test_invalid_geometry(geometry):
+    with pytest.raises(ValueError):
+        parse_polygon(geometry)
@@ -0,0 +1,33 @@
+# tests/test_raster.py
+import io
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import raster
+
+
+def test_png_roundtrip():
+    grid = np.array([[0.0, 1.0, 2.0], [np.nan, 4.0, 0.0]])
+    png = raster.encode_png(raster.colorize(grid))
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+
+    width, height, depth, color_type = struct.unpack(">IIBB", png[16:26])
+    assert (width, height, depth, color_type) == (3, 2, 8, 6)
+
+    idat_length = struct.unpack(">I", png[33:37])[0]
+    pixels = np.frombuffer(zlib.decompress(png[41:41 + idat_length]), dtype=np.uint8)
+    pixels = pixels.reshape(height, width * 4 + 1)[:, 1:].reshape(height, width, 4)
+    # Celdas vacías (0 o NaN) transparentes; el máximo toma el último color de la rampa
+    assert pixels[..., 3].tolist() == [[0, 255, 255], [0, 255, 0]]
+    assert pixels[1, 1, :3].tolist() == [189, 0, 38]
+
+
+def test_npy_roundtrip():
+    grid = np.arange(6, dtype=np.float64).reshape(2, 3)
+    assert np.array_equal(np.load(io.BytesIO(raster.encode_npy(grid))), grid)
@@ -0,0 +1,96 @@
+# tests/test_snapshot.py
+import math
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services import service
+from src.services.snapshot import UrbanQualitySnapshot
+
+ROWS = [
+    # lat, lon, POBTOT, GRAPROES, GRAPROES_F, GRAPROES_M, ARBOLES_C
+    (25.70, -100.30, 120, 10.5, 10.1, 10.9, 1),
+    (25.60, -100.35, 80, None, None, None, None),
+    (25.65, -100.20, 40, 9.0, 8.5, 9.5, 3),
+    (25.65, -100.31, 15, 12.0, 11.8, 12.2, 2),
+]
+
+
+def test_query_matches_bbox():
+    # Solo regresa los puntos dentro del rectángulo (bordes inclusivos)
+    snapshot = UrbanQualitySnapshot.from_rows(ROWS, version="v1")
+    rows = snapshot.query("population", 25.60, 25.65, -100.35, -100.30)
+
+    assert sorted(rows) == [(25.6, -100.35, 80), (25.65, -100.31, 15)]
+    assert rows[0].POBTOT in (80, 15)
+
+
+def test_query_accepts_swapped_bounds():
+    snapshot = UrbanQualitySnapshot.from_rows(ROWS, version="v1")
+
+    assert sorted(snapshot.query("trees", 25.7, 25.6, -100.2, -100.4)) == sorted(
+        snapshot.query("trees", 25.6, 25.7, -100.4, -100.2)
+    )
+
+
+def test_nulls_come_back_as_none():
+    # Las columnas con nulos se guardan como NaN pero se responden como None
+    snapshot = UrbanQualitySnapshot.from_rows(ROWS, version="v1")
+    rows = {row.lat: row for row in snapshot.query("education", 25.5, 25.8, -101, -100)}
+
+    assert rows[25.60].GRAPROES is None
+    assert rows[25.70].GRAPROES == 10.5
+
+    trees = {row.lat: row.ARBOLES_C for row in snapshot.query("trees", 25.5, 25.8, -101, -100)}
+    assert trees[25.60] is None
+    assert trees[25.70] == 1 and isinstance(trees[25.70], int)
+
+
+def test_empty_snapshot():
+    snapshot = UrbanQualitySnapshot.from_rows([], version="v0")
+
+    assert snapshot.size == 0
+    assert snapshot.query("population", 0, 1, 0, 1) == []
+
+
+def test_nearest_orders_by_distance():
+    # Los k más cercanos con su distancia en metros, del más cercano al más lejano
+    snapshot = UrbanQualitySnapshot.from_rows(ROWS, version="v1")
+    rows = snapshot.nearest(25.70, -100.30, 2)
+    assert [(row[0], row[1]) for row in rows] == [(25.70, -100.30), (25.65, -100.31)]
+    assert rows[0][-1] == 0.0
+    assert 5000 < rows[1][-1] < 6000
+    # Con k mayor que el dataset regresa todos los puntos
+    assert len(snapshot.nearest(0.0, 0.0, 10)) == len(ROWS)
+
+
+class _PlanarKNNSession:
+    # Imita `ORDER BY point <-> point LIMIT n`: orden por distancia en grados
+    def __init__(self, rows):
+        self.rows = rows
+        self.limits = []
+
+    def execute(self, query):
+        lat, lon, limit = query
+        self.limits.append(limit)
+        ordered = sorted(self.rows, key=lambda row: math.hypot(row[1] - lon, row[0] - lat))
+        return SimpleNamespace(all=lambda: ordered[:limit])
+
+
+def test_db_nearest_refetches_until_exact(monkeypatch):
+    # A 60° de latitud un grado de longitud mide la mitad: los puntos al este
+    # quedan después de los del norte en el orden plano aunque estén más cerca
+    monkeypatch.setattr(service.snapshot, "snapshot_enabled", lambda: False)
+    monkeypatch.setattr(service, "select_nearest", lambda lat, lon, limit: (lat, lon, limit))
+    north = [(60.0 + 0.010 + i * 1e-4, 10.0, 0, None, None, None, None) for i in range(8)]
+    east = [(60.0, 10.0 + 0.015 + i * 1e-4, 1, None, None, None, None) for i in range(2)]
+    session = _PlanarKNNSession(north + east)
+
+    rows = service.get_nearest(session, 60.0, 10.0, 2)
+
+    expected = UrbanQualitySnapshot.from_rows(north + east, version="v1").nearest(60.0, 10.0, 2)
+    assert [(row[0], row[1]) for row in rows] == [(row[0], row[1]) for row in expected]
+    assert [row[2] for row in rows] == [1, 1]
+    assert session.limits == [8, 32]